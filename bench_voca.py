@@ -0,0 +1,386 @@
+"""
+voca.py 헤드리스 벤치마크 (네트워크 없이 실행)
+
+- Streamlit AppTest로 voca.py 를 그대로 실행
+- 구글 시트(gspread)는 메모리 안의 가짜 워크시트, Gemini는 지연 시간을 정할 수 있는 가짜 모델로 대체
+- 단어 수(기본 100 / 1k / 10k / 50k)마다 동작별로
+  rerun 시간, 최대 메모리(tracemalloc), 시트/모델 호출 수를 재서 JSON으로 저장
+
+사용 예:
+    python bench_voca.py
+    python bench_voca.py --sizes 100 1000 --latency 0.2 --output bench_output.json
+    python bench_voca.py --backend sqlite --baseline old_bench_output.json
+
+참고
+- AppTest는 fragment만 다시 실행하는 기능을 흉내 내지 않으므로
+  퀴즈 답하기 시간은 전체 rerun 기준 (실제 앱에서는 이보다 짧음)
+- tracemalloc 이 켜져 있으면 시간이 더 걸림 → 순수 시간만 보려면 --no-memory
+- "sheets" 저장소는 쓰기를 백그라운드에서 보내므로, 쓰기 동작 뒤에는 잠깐 기다렸다가
+  그동안 생긴 시트 호출을 background_calls 로 따로 기록 (wall_ms 에는 포함 안 됨)
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import gspread
+import google.generativeai as genai
+import pandas as pd
+import streamlit as st
+from gspread.utils import a1_to_rowcol
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "voca.py")
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+SUBJECTS = ["공통/기타", "영문법의 기초", "영문법의 활용", "영어교수법", "영어회화1", "영화로 생각하기"]
+POS_TAGS = ["[명사]", "[동사]", "[형용사]", "[부사]"]
+SYLLABLES = "가나다라마바사아자차카타파하주소연설말고상한실행도움"
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+CALLS = {}
+
+
+def count_call(name):
+    CALLS[name] = CALLS.get(name, 0) + 1
+
+
+# ==========================================
+# 가짜 구글 시트 / Gemini
+# ==========================================
+class FakeWorksheet:
+    """gspread Worksheet 중 voca.py 가 쓰는 메서드만 메모리에서 흉내"""
+    id = 0
+
+    def __init__(self, values):
+        self.values = values
+        self.col_count = len(values[0])
+        self.revision = None
+        self.spreadsheet = SimpleNamespace(
+            fetch_sheet_metadata=self._fetch_sheet_metadata,
+            batch_update=self._spreadsheet_batch_update,
+        )
+
+    def _set(self, row, col, value):
+        while len(self.values) < row:
+            self.values.append([])
+        cells = self.values[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = value
+
+    def _fetch_sheet_metadata(self, params=None):
+        count_call("fetch_sheet_metadata")
+        metadata = [] if self.revision is None else [{"metadataKey": "voca_revision", "metadataValue": self.revision}]
+        return {"sheets": [{"properties": {"sheetId": self.id}, "developerMetadata": metadata}]}
+
+    def _spreadsheet_batch_update(self, body):
+        count_call("spreadsheet.batch_update")
+        for request in body["requests"]:
+            if "deleteDimension" in request:
+                grid = request["deleteDimension"]["range"]
+                del self.values[grid["startIndex"]:grid["endIndex"]]
+            elif "createDeveloperMetadata" in request:
+                self.revision = request["createDeveloperMetadata"]["developerMetadata"]["metadataValue"]
+            else:
+                self.revision = request["updateDeveloperMetadata"]["developerMetadata"]["metadataValue"]
+
+    def get_all_values(self):
+        count_call("get_all_values")
+        return [list(row) for row in self.values]
+
+    def add_cols(self, cols):
+        count_call("add_cols")
+        self.col_count += cols
+
+    def update(self, range_name, values):
+        count_call("update")
+        row, col = a1_to_rowcol(range_name)
+        for i, cells in enumerate(values):
+            for j, value in enumerate(cells):
+                self._set(row + i, col + j, value)
+
+    def batch_update(self, data):
+        count_call("batch_update")
+        for item in data:
+            row, col = a1_to_rowcol(item["range"])
+            self._set(row, col, item["values"][0][0])
+
+    def acell(self, label):
+        count_call("acell")
+        row, col = a1_to_rowcol(label)
+        cells = self.values[row - 1] if row <= len(self.values) else []
+        return SimpleNamespace(value=cells[col - 1] if col <= len(cells) else "")
+
+    def col_values(self, col):
+        count_call("col_values")
+        return [cells[col - 1] if col <= len(cells) else "" for cells in self.values]
+
+    def row_values(self, row):
+        count_call("row_values")
+        return list(self.values[row - 1])
+
+    def append_rows(self, rows, **kwargs):
+        count_call("append_rows")
+        start = len(self.values) + 1
+        self.values.extend(list(row) for row in rows)
+        return {"updates": {"updatedRange": f"Sheet1!A{start}:E{len(self.values)}"}}
+
+    def delete_rows(self, start_index, end_index=None):
+        count_call("delete_rows")
+        del self.values[start_index - 1:(end_index or start_index)]
+
+
+class FakeModel:
+    """GenerativeModel 대역: latency 초만큼 기다렸다가 형식에 맞는 답을 돌려줌"""
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        count_call("generate_content")
+        time.sleep(FakeModel.latency)
+        word = re.search(r"Input: '(.*)'", prompt).group(1)
+        text = (
+            f"CORRECT_WORD: {word}\n"
+            f"1. [명사] {word}의 뜻 @@@ This is a {word}.\n"
+            f"2. [동사] {word}하다 @@@ We {word} every day."
+        )
+        if stream:
+            return [SimpleNamespace(text=text[k:k + 20]) for k in range(0, len(text), 20)]
+        return SimpleNamespace(text=text)
+
+
+def make_vocabulary(size, seed=0):
+    """헤더 + size 행짜리 가짜 시트 값 (항상 같은 결과가 나오도록 seed 고정)"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(LETTERS, k=rng.randint(4, 11))))
+    words = sorted(words)
+    rng.shuffle(words)
+
+    values = [["단어", "뜻", "예문", "과목", "ID"]]
+    for n, word in enumerate(words):
+        meanings = "\n".join(
+            f"{k}. {rng.choice(POS_TAGS)} {''.join(rng.choices(SYLLABLES, k=rng.randint(2, 6)))}"
+            for k in range(1, 4)
+        )
+        examples = "\n".join(
+            f"{k}. The {word} " + " ".join(rng.choices(words[:200] or [word], k=5)) + "."
+            for k in range(1, 4)
+        )
+        values.append([word, meanings, examples, rng.choice(SUBJECTS), f"b{n:08d}"])
+    return values
+
+
+def install_fakes(worksheet):
+    book = SimpleNamespace(worksheet=lambda name: worksheet)
+    client = SimpleNamespace(open_by_url=lambda url: book, open=lambda title: book)
+    gspread.service_account_from_dict = lambda info, **kwargs: client
+    genai.GenerativeModel = FakeModel
+    genai.configure = lambda **kwargs: None
+
+
+# ==========================================
+# 측정
+# ==========================================
+def find_button(at, label=None, key_prefix=None):
+    for button in at.button:
+        if label is not None and button.label.startswith(label):
+            return button
+        if key_prefix is not None and button.key and button.key.startswith(key_prefix):
+            return button
+    raise LookupError(f"버튼을 찾을 수 없습니다: {label or key_prefix}")
+
+
+def find_text_input(at, label):
+    return next(t for t in at.text_input if t.label.startswith(label))
+
+
+def calls_since(before):
+    return {name: CALLS[name] - before.get(name, 0) for name in CALLS if CALLS[name] - before.get(name, 0)}
+
+
+def measure(results, size, tab, action, at, step, track_memory, settle=0.0):
+    """step() 으로 위젯을 조작하고 rerun 한 번의 시간/메모리/호출 수 기록
+    - settle 초만큼 더 기다리며 백그라운드 쓰기 호출을 따로 모음
+    """
+    before = dict(CALLS)
+    if track_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    step()
+    at.run()
+    wall_ms = (time.perf_counter() - start) * 1000
+    peak_kb = tracemalloc.get_traced_memory()[1] / 1024 if track_memory else None
+
+    if at.exception:
+        raise RuntimeError(f"{action} 실행 중 앱 오류: {at.exception[0].message}")
+    calls = calls_since(before)
+    before = dict(CALLS)
+    if settle:
+        time.sleep(settle)
+    results.append({
+        "size": size,
+        "tab": tab,
+        "action": action,
+        "wall_ms": round(wall_ms, 2),
+        "peak_mem_kb": round(peak_kb, 1) if peak_kb is not None else None,
+        "calls": calls,
+        "background_calls": calls_since(before),
+    })
+    print(f"  {size:>6} | {tab:<6} | {action:<16} | {wall_ms:9.1f} ms"
+          + (f" | {peak_kb / 1024:8.1f} MB" if peak_kb is not None else ""))
+
+
+def bench_size(size, args, results):
+    worksheet = FakeWorksheet(make_vocabulary(size))
+    install_fakes(worksheet)
+    # 이전 크기에서 만든 공유 캐시/저장소를 비우고 로컬 데이터도 새 폴더에서 시작
+    st.cache_resource.clear()
+    data_dir = tempfile.mkdtemp(prefix="voca_bench_")
+    os.environ["VOCA_DATA_DIR"] = data_dir
+    os.environ["VOCA_STORAGE"] = args.backend
+    FakeModel.latency = args.latency
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    at.secrets["connections"] = {"gsheets": {"spreadsheet": "https://example.invalid/sheet", "type": "service_account"}}
+    at.secrets["gemini"] = {"api_key": "bench"}
+
+    def noop():
+        pass
+
+    def search():
+        find_text_input(at, "📂").set_value(worksheet.values[1][0][:3])
+
+    def clear_search():
+        find_text_input(at, "📂").set_value("")
+
+    def dup_scan():
+        at.checkbox(key="dup_typo").check()
+        find_button(at, label="🔍 중복 찾기").click()
+
+    def analyze():
+        find_text_input(at, "단어 또는 숙어").set_value(f"benchword{size}")
+        find_button(at, label="🔍 분석").click()
+
+    def add():
+        find_button(at, label="💾 단어장에 추가하기").click()
+
+    def open_editor():
+        find_button(at, key_prefix="edit_").click()
+
+    def save_edit():
+        button = find_button(at, key_prefix="save_")
+        at.text_area(key="m_" + button.key[len("save_"):]).set_value("1. [명사] 수정된 뜻")
+        button.click()
+
+    def delete():
+        find_button(at, key_prefix="del_").click()
+
+    def quiz_start():
+        find_button(at, label="🚀 퀴즈 시작").click()
+
+    def quiz_reveal():
+        find_button(at, label="정답 보기").click()
+
+    def quiz_answer():
+        find_button(at, label="✅ 알았어").click()
+
+    track = not args.no_memory
+    writes = {"add", "edit", "delete"}
+    steps = [
+        ("tab1", "cold_start", noop),
+        ("tab1", "rerun", noop),
+        ("tab1", "search_filter", search),
+        ("tab1", "clear_filter", clear_search),
+        ("tab1", "duplicate_scan", dup_scan),
+        ("tab1", "analyze", analyze),
+        ("tab1", "add", add),
+        ("tab1", "open_editor", open_editor),
+        ("tab1", "edit", save_edit),
+        ("tab1", "open_editor_2", open_editor),
+        ("tab1", "delete", delete),
+        ("tab3", "quiz_start", quiz_start),
+        ("tab3", "quiz_reveal", quiz_reveal),
+        ("tab3", "quiz_answer", quiz_answer),
+    ]
+    try:
+        for tab, action, step in steps:
+            settle = args.flush_wait if action in writes else 0.0
+            measure(results, size, tab, action, at, step, track, settle)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def compare(results, baseline_path, threshold):
+    """이전 결과와 비교해서 threshold 배 이상 느려진 항목 출력 → 느려진 항목 수"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["size"], r["action"]): r["wall_ms"] for r in baseline["results"]}
+    slower = 0
+    print(f"\n비교: {baseline_path}")
+    for r in results:
+        key = (r["size"], r["action"])
+        if not old.get(key):
+            continue
+        ratio = r["wall_ms"] / old[key]
+        mark = "⚠️" if ratio >= threshold else "  "
+        if ratio >= threshold:
+            slower += 1
+        print(f"{mark} {r['size']:>6} {r['action']:<16} {old[key]:9.1f} → {r['wall_ms']:9.1f} ms ({ratio:.2f}x)")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="voca.py 헤드리스 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="단어 수 목록")
+    parser.add_argument("--latency", type=float, default=0.0, help="가짜 Gemini 응답 지연 (초)")
+    parser.add_argument("--backend", choices=["sheets", "sqlite", "parquet"], default="sheets", help="VOCA_STORAGE 값")
+    parser.add_argument("--output", default="bench_output.json", help="결과 JSON 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="이 배수 이상 느려지면 표시")
+    parser.add_argument("--timeout", type=float, default=600, help="rerun 한 번 제한 시간 (초)")
+    parser.add_argument("--flush-wait", type=float, default=2.0, help="쓰기 동작 뒤 백그라운드 쓰기를 기다리는 시간 (초)")
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc 끄기 (시간만 측정)")
+    args = parser.parse_args()
+
+    if not args.no_memory:
+        tracemalloc.start()
+
+    results = []
+    print(f"{'size':>8} | {'tab':<6} | {'action':<16} | {'wall':>12}" + ("" if args.no_memory else " | peak mem"))
+    for size in args.sizes:
+        bench_size(size, args, results)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "pandas": pd.__version__,
+        "backend": args.backend,
+        "latency": args.latency,
+        "memory_tracked": not args.no_memory,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {args.output}")
+
+    if args.baseline:
+        slower = compare(results, args.baseline, args.threshold)
+        sys.exit(1 if slower else 0)
+
+
+if __name__ == "__main__":
+    main()
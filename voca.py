@@ -1,559 +1,3891 @@
-import streamlit as st
-from streamlit_gsheets import GSheetsConnection
-import pandas as pd
-import google.generativeai as genai
-import re
-import random
-
-# 1. 페이지 설정
-st.set_page_config(page_title="방송대 영단어장", page_icon="🎓", layout="wide")
-st.title("🎓 AI 영단어장 (V11: 퀴즈 모드 추가)")
-
-# 2. Gemini 설정
-try:
-    if "gemini" in st.secrets and "api_key" in st.secrets["gemini"]:
-        genai.configure(api_key=st.secrets["gemini"]["api_key"])
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-    else:
-        st.error("🚨 Secrets에 API 키가 없습니다.")
-        model = None
-except Exception as e:
-    st.error(f"Gemini 설정 오류: {e}")
-    model = None
-
-# 3. 구글 시트 연결
-conn = st.connection("gsheets", type=GSheetsConnection)
-
-try:
-    existing_data = conn.read(worksheet="Sheet1", ttl=0)
-    existing_data = existing_data.dropna(how="all")
-    
-    for col in ["단어", "뜻", "예문", "과목"]:
-        if col not in existing_data.columns:
-            existing_data[col] = "공통/기타" if col == "과목" else ""
-            
-    if not existing_data.empty:
-        existing_words = existing_data["단어"].astype(str).str.strip().tolist()
-    else:
-        existing_words = []
-except:
-    existing_data = pd.DataFrame(columns=["단어", "뜻", "예문", "과목"])
-    existing_words = []
-
-# 전공 과목 리스트 
-SUBJECTS = [
-    "공통/기타",
-    "영문법의 기초", 
-    "영문법의 활용", 
-    "영어교수법", 
-    "테스트영어연습", 
-    "영어회화1", 
-    "영화로 생각하기", 
-    "영작문2"
-]
-
-# 탭 구성
-tab1, tab2, tab3 = st.tabs(["📚 단어장 관리", "🧰 영어 공부 도구함", "🎯 퀴즈 모드"])
-
-# ==========================================
-# 탭 1: 단어장
-# ==========================================
-with tab1:
-    with st.expander("🔍 단어/숙어 분석 및 추가", expanded=True):
-        with st.form("search_form", clear_on_submit=True):
-            col_input, col_btn = st.columns([4, 1])
-            with col_input:
-                word_input = st.text_input("단어 또는 숙어 입력", placeholder="예: address")
-            with col_btn:
-                search_submitted = st.form_submit_button("🔍 분석")
-
-            if search_submitted and word_input:
-                input_word = word_input.strip()
-                
-                if not model:
-                    st.error("AI 모델 연결 실패")
-                else:
-                    with st.spinner(f"AI가 '{input_word}'를 분석 중..."):
-                        try:
-                            prompt = f"""
-                            Role: Comprehensive English-Korean Dictionary
-                            Input: '{input_word}'
-                            
-                            Task:
-                            1. Identify the correct word/phrase (fix typos).
-                            2. Select 3 distinct meanings.
-                            3. **CRITICAL:** If the word has multiple Parts of Speech (e.g., Noun AND Verb), YOU MUST INCLUDE BOTH TYPES.
-                            4. Prefix the Korean meaning with the Part of Speech tag: [명사], [동사] etc.
-                            
-                            STRICT Output Format:
-                            CORRECT_WORD: <Corrected Word>
-                            [POS] Korean Meaning @@@ English Example Sentence
-                            """
-                            response = model.generate_content(prompt)
-                            st.session_state['analyzed_result'] = response.text
-                            st.session_state['analyzed_word'] = input_word 
-                        except Exception as e:
-                            st.error(f"오류 발생: {e}")
-
-    # 분석 결과 확인
-    if 'analyzed_result' in st.session_state and 'analyzed_word' in st.session_state:
-        raw_text = st.session_state['analyzed_result']
-        
-        meanings_list = []
-        examples_list = []
-        final_word = st.session_state.get('analyzed_word', 'Unknown')
-        
-        lines = raw_text.strip().split('\n')
-        valid_data_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-            
-            if line.startswith("CORRECT_WORD:"):
-                try:
-                    final_word = line.split(":", 1)[1].strip()
-                    st.session_state['analyzed_word'] = final_word
-                except:
-                    pass
-            elif "@@@" in line:
-                valid_data_lines.append(line)
-
-        for i, line in enumerate(valid_data_lines):
-            parts = line.split("@@@", 1)
-            raw_meaning = re.sub(r'^[\d\.\-\)\s]+', '', parts[0].strip())
-            raw_example = re.sub(r'^[\d\.\-\)\s]+', '', parts[1].strip())
-            
-            meanings_list.append(f"{i+1}. {raw_meaning}")
-            examples_list.append(f"{i+1}. {raw_example}")
-        
-        default_meaning = '\n'.join(meanings_list)
-        default_example = '\n'.join(examples_list)
-
-        if final_word in existing_words:
-            st.warning(f"⚠️ '{final_word}'는 이미 단어장에 있습니다!")
-        else:
-            st.info(f"🧐 **{final_word}** 검색 결과입니다.")
-        
-        with st.container():
-            selected_subject_to_save = st.selectbox("📚 저장할 과목을 선택하세요", SUBJECTS)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                final_meaning = st.text_area("🇰🇷 뜻 (품사 포함)", value=default_meaning, height=150)
-            with col2:
-                final_example = st.text_area("🇺🇸 예문", value=default_example, height=150)
-
-            if st.button("💾 단어장에 추가하기", type="primary", use_container_width=True):
-                if not final_meaning or not final_example:
-                    st.warning("내용이 비어있습니다.")
-                elif final_word in existing_words:
-                    st.error("이미 저장된 단어입니다.")
-                else:
-                    try:
-                        current_df = conn.read(worksheet="Sheet1", ttl=0)
-                        
-                        for col in ["단어", "뜻", "예문", "과목"]:
-                            if col not in current_df.columns:
-                                current_df[col] = "공통/기타" if col == "과목" else ""
-
-                        new_entry = pd.DataFrame([{
-                            "단어": final_word,
-                            "뜻": final_meaning,
-                            "예문": final_example,
-                            "과목": selected_subject_to_save
-                        }])
-                        updated_data = pd.concat([current_df, new_entry], ignore_index=True)
-                        conn.update(worksheet="Sheet1", data=updated_data)
-                        
-                        st.toast(f"'{final_word}' 저장 성공! 🎉")
-                        if 'analyzed_word' in st.session_state: del st.session_state['analyzed_word']
-                        if 'analyzed_result' in st.session_state: del st.session_state['analyzed_result']
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"저장 실패: {e}")
-
-    # 목록 및 백업/링크
-    st.divider()
-    
-    col_header, col_buttons = st.columns([2, 1])
-    
-    with col_header:
-        st.subheader(f"📝 저장된 단어장 ({len(existing_data)}개)")
-        
-        filter_col1, filter_col2 = st.columns(2)
-        with filter_col1:
-            filter_keyword = st.text_input("📂 단어/뜻 검색", placeholder="검색어 입력...")
-        with filter_col2:
-            if not existing_data.empty and '과목' in existing_data.columns:
-                available_subjects = ["전체 보기"] + sorted(list(existing_data['과목'].dropna().unique()))
-            else:
-                available_subjects = ["전체 보기"]
-            filter_subject = st.selectbox("📚 과목별 보기", available_subjects)
-
-    with col_buttons:
-        st.write("")
-        st.write("")
-        b_col1, b_col2 = st.columns(2)
-        with b_col1:
-            if not existing_data.empty:
-                csv = existing_data.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    label="💾 엑셀 백업",
-                    data=csv,
-                    file_name='my_voca_backup.csv',
-                    mime='text/csv',
-                    type='secondary',
-                    use_container_width=True
-                )
-        with b_col2:
-            try:
-                sheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
-            except:
-                sheet_url = "https://docs.google.com/spreadsheets"
-            st.link_button("📂 시트 열기", sheet_url, use_container_width=True)
-
-    if not existing_data.empty:
-        display_data = existing_data.copy()
-        
-        if filter_keyword:
-            display_data = display_data[
-                display_data['단어'].str.contains(filter_keyword, case=False, na=False) | 
-                display_data['뜻'].str.contains(filter_keyword, case=False, na=False)
-            ]
-            
-        if filter_subject != "전체 보기":
-            if '과목' in display_data.columns:
-                display_data = display_data[display_data['과목'] == filter_subject]
-
-        if display_data.empty:
-            st.info("조건에 맞는 단어가 없습니다.")
-        else:
-            for i in sorted(display_data.index, reverse=True):
-                row = display_data.loc[i]
-                subj_tag = f" [{row['과목']}]" if '과목' in row and pd.notna(row['과목']) else ""
-                
-                with st.expander(f"📖 {row['단어']}{subj_tag}"):
-                    
-                    col_copy, col_dict = st.columns([1, 1])
-                    
-                    with col_copy:
-                        st.caption("복사하기")
-                        st.code(row['단어'], language="text")
-                        
-                    with col_dict:
-                        st.caption("발음 듣기 (네이버 사전)")
-                        dict_url = f"https://en.dict.naver.com/#/search?query={row['단어']}"
-                        st.link_button(f"🔊 {row['단어']} 발음 듣기", dict_url, use_container_width=True)
-
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        new_meaning = st.text_area("뜻", row['뜻'], key=f"m_{i}", height=100)
-                    with c2:
-                        new_example = st.text_area("예문", row['예문'], key=f"e_{i}", height=100)
-                    
-                    current_subj_val = row['과목'] if '과목' in row and pd.notna(row['과목']) else "공통/기타"
-                    new_subj = st.selectbox("과목 변경", SUBJECTS, index=SUBJECTS.index(current_subj_val) if current_subj_val in SUBJECTS else 0, key=f"s_{i}")
-
-                    col_save, col_del = st.columns([1, 1])
-                    with col_save:
-                        if st.button("💾 수정", key=f"save_{i}"):
-                            existing_data.at[i, "뜻"] = new_meaning
-                            existing_data.at[i, "예문"] = new_example
-                            existing_data.at[i, "과목"] = new_subj
-                            conn.update(worksheet="Sheet1", data=existing_data)
-                            st.toast("수정 완료!")
-                            st.rerun()
-                    with col_del:
-                        if st.button("🗑️ 삭제", key=f"del_{i}"):
-                            updated_data = existing_data.drop(index=i)
-                            conn.update(worksheet="Sheet1", data=updated_data)
-                            st.toast("삭제 완료!")
-                            st.rerun()
-    else:
-        st.info("단어를 검색해서 추가해보세요!")
-
-# ==========================================
-# 탭 2: 영어 공부 도구함
-# ==========================================
-with tab2:
-    st.header("🧰 유용한 영어 도구 모음")
-    st.write("단어장과 함께 쓰면 좋은 사이트들을 모았습니다. 버튼만 누르세요!")
-    
-    st.divider()
-
-    col_t1, col_t2 = st.columns(2)
-
-    with col_t1:
-        st.subheader("🤖 번역 & 문법")
-        st.link_button("🚀 Google Gemini (AI 비서)", "https://gemini.google.com", type="primary", use_container_width=True)
-        st.link_button("🧠 DeepL (자연스러운 번역)", "https://www.deepl.com/translator", use_container_width=True)
-        st.link_button("🦜 Papago (네이버 번역)", "https://papago.naver.com", use_container_width=True)
-        st.link_button("✍️ Grammarly (문법 검사기)", "https://app.grammarly.com/", use_container_width=True)
-
-    with col_t2:
-        st.subheader("📺 학습 & 암기")
-        st.link_button("📺 YouGlish (실제 발음 검색)", "https://youglish.com", use_container_width=True)
-        st.link_button("🔁 Anki (플래시카드 암기)", "https://apps.ankiweb.net/", use_container_width=True)
-    
-    st.info("💡 Tip: YouGlish에서 검색하시면 실제 유튜브 영상들 속에서 원어민들이 해당 단어를 발음하는 문장들을 모아볼 수 있습니다.")
-
-# ==========================================
-# 탭 3: 퀴즈 모드
-# ==========================================
-with tab3:
-
-    # ---------- 헬퍼: 퀴즈 초기화 ----------
-    def start_quiz(words_df, mode, count):
-        """
-        words_df : 필터링된 DataFrame
-        mode     : "단어 → 뜻" or "뜻 → 단어"
-        count    : 문제 수 (int)
-        """
-        sampled = words_df.sample(n=min(count, len(words_df))).reset_index(drop=True)
-        st.session_state["qz_words"]   = sampled.to_dict("records")  # list of dicts
-        st.session_state["qz_mode"]    = mode
-        st.session_state["qz_index"]   = 0
-        st.session_state["qz_correct"] = 0
-        st.session_state["qz_wrong"]   = 0
-        st.session_state["qz_revealed"]= False
-        st.session_state["qz_active"]  = True
-        st.session_state["qz_done"]    = False
-
-    def reset_quiz():
-        for k in ["qz_words","qz_mode","qz_index","qz_correct",
-                  "qz_wrong","qz_revealed","qz_active","qz_done",
-                  "qz_saved","qz_last_subject"]:
-            if k in st.session_state:
-                del st.session_state[k]
-
-    # ---------- 단어 없을 때 ----------
-    if existing_data.empty:
-        st.info("저장된 단어가 없습니다. 탭1에서 단어를 추가하세요!")
-        st.stop()
-
-    # ---------- 퀴즈 미시작: 설정 화면 ----------
-    if not st.session_state.get("qz_active", False):
-
-        st.header("🎯 퀴즈 모드")
-        st.write("저장된 단어장으로 플래시카드 퀴즈를 풀어보세요!")
-        st.divider()
-
-        c1, c2, c3 = st.columns(3)
-
-        with c1:
-            # 과목 필터
-            quiz_subjects = ["전체"] + sorted(
-                [s for s in existing_data["과목"].dropna().unique() if s]
-            )
-            quiz_subject = st.selectbox("📚 과목 선택", quiz_subjects)
-
-        with c2:
-            # 문제 수
-            if quiz_subject == "전체":
-                max_count = len(existing_data)
-            else:
-                max_count = len(existing_data[existing_data["과목"] == quiz_subject])
-
-            quiz_count = st.number_input(
-                f"📝 문제 수 (최대 {max_count}개)",
-                min_value=1,
-                max_value=max(1, max_count),
-                value=min(25, max_count),
-                step=1
-            )
-
-        with c3:
-            # 퀴즈 방향
-            quiz_mode = st.selectbox(
-                "🔄 퀴즈 방향",
-                ["단어 → 뜻", "뜻 → 단어"]
-            )
-
-        st.write("")
-
-        if st.button("🚀 퀴즈 시작!", type="primary", use_container_width=True):
-            if quiz_subject == "전체":
-                filtered_df = existing_data.copy()
-            else:
-                filtered_df = existing_data[existing_data["과목"] == quiz_subject].copy()
-
-            if filtered_df.empty:
-                st.warning("선택한 과목에 단어가 없습니다.")
-            else:
-                start_quiz(filtered_df, quiz_mode, int(quiz_count))
-                st.session_state["qz_last_subject"] = quiz_subject
-                st.session_state["qz_saved"] = False
-                st.rerun()
-
-    # ---------- 결과 화면 ----------
-    elif st.session_state.get("qz_done", False):
-
-        words   = st.session_state["qz_words"]
-        correct = st.session_state["qz_correct"]
-        wrong   = st.session_state["qz_wrong"]
-        total   = len(words)
-        pct     = int(correct / total * 100) if total > 0 else 0
-
-        st.header("🏁 퀴즈 완료!")
-        st.divider()
-
-        m1, m2, m3 = st.columns(3)
-        m1.metric("✅ 맞음", f"{correct}개")
-        m2.metric("❌ 틀림", f"{wrong}개")
-        m3.metric("📊 정답률", f"{pct}%")
-
-        st.write("")
-
-        if pct == 100:
-            st.success("🎉 완벽해요! 모두 다 알고 있네요!")
-        elif pct >= 70:
-            st.info("👍 잘했어요! 조금만 더 복습하면 완벽!")
-        else:
-            st.warning("💪 더 복습이 필요해요. 한 번 더 도전해보세요!")
-
-        st.divider()
-
-        # 틀린 단어 모아보기
-        wrong_indices = [
-            i for i, r in enumerate(words)
-            if r.get("_result") == "wrong"
-        ]
-        if wrong_indices:
-            with st.expander(f"❌ 틀린 단어 모아보기 ({len(wrong_indices)}개)"):
-                for idx in wrong_indices:
-                    row = words[idx]
-                    st.markdown(f"**{row['단어']}**")
-                    st.caption(row["뜻"])
-                    st.divider()
-
-        st.divider()
-
-        col_r1, col_r2 = st.columns(2)
-        with col_r1:
-            if st.button("🔄 같은 설정으로 다시", use_container_width=True):
-                mode = st.session_state["qz_mode"]
-                df_retry = pd.DataFrame(words).drop(columns=["_result"], errors="ignore")
-                start_quiz(df_retry, mode, len(words))
-                st.rerun()
-        with col_r2:
-            if st.button("🏠 설정 화면으로", use_container_width=True, type="primary"):
-                reset_quiz()
-                st.rerun()
-
-    # ---------- 퀴즈 진행 중 ----------
-    else:
-        words   = st.session_state["qz_words"]
-        idx     = st.session_state["qz_index"]
-        mode    = st.session_state["qz_mode"]
-        total   = len(words)
-
-        # 혹시 인덱스 초과 → 완료 처리
-        if idx >= total:
-            st.session_state["qz_done"] = True
-            st.rerun()
-
-        current = words[idx]
-
-        # 진행 표시
-        st.progress((idx) / total, text=f"진행: {idx}/{total}문제")
-
-        col_correct, col_wrong, col_quit = st.columns([2, 2, 1])
-        col_correct.metric("✅ 맞음", st.session_state["qz_correct"])
-        col_wrong.metric("❌ 틀림", st.session_state["qz_wrong"])
-        with col_quit:
-            st.write("")
-            if st.button("🚪 종료", use_container_width=True):
-                reset_quiz()
-                st.rerun()
-
-        st.divider()
-
-        # 문제 카드
-        st.markdown(f"### 문제 {idx + 1} / {total}")
-
-        if mode == "단어 → 뜻":
-            question_label = "🔤 단어"
-            question_value = current["단어"]
-            answer_label   = "🇰🇷 뜻"
-            answer_value   = current["뜻"]
-        else:
-            question_label = "🇰🇷 뜻"
-            question_value = current["뜻"]
-            answer_label   = "🔤 단어"
-            answer_value   = current["단어"]
-
-        # 문제 표시
-        st.markdown(
-            f"""
-            <div style="
-                background: #1e3a5f;
-                border-radius: 16px;
-                padding: 32px;
-                text-align: center;
-                margin: 16px 0;
-            ">
-                <p style="color:#aac8e4; font-size:14px; margin:0 0 8px 0;">{question_label}</p>
-                <p style="color:#ffffff; font-size:32px; font-weight:700; margin:0; word-break:break-word;">
-                    {question_value}
-                </p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-        # 정답 공개 전
-        if not st.session_state["qz_revealed"]:
-            if st.button("정답 보기", use_container_width=True, type="primary"):
-                st.session_state["qz_revealed"] = True
-                st.rerun()
-
-        # 정답 공개 후
-        else:
-            # 정답 카드
-            st.markdown(
-                f"""
-                <div style="
-                    background: #1a4a2e;
-                    border-radius: 16px;
-                    padding: 24px;
-                    text-align: center;
-                    margin: 8px 0 16px 0;
-                ">
-                    <p style="color:#7fd4a0; font-size:14px; margin:0 0 8px 0;">{answer_label}</p>
-                    <p style="color:#d4f5e2; font-size:22px; font-weight:600; margin:0; word-break:break-word;">
-                        {answer_value}
-                    </p>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-
-            # 예문도 보여주기
-            if current.get("예문"):
-                with st.expander("📖 예문 보기"):
-                    st.write(current["예문"])
-
-            # 맞음/틀림 버튼
-            btn_col1, btn_col2 = st.columns(2)
-
-            with btn_col1:
-                if st.button("✅ 알았어!", use_container_width=True, type="primary"):
-                    st.session_state["qz_words"][idx]["_result"] = "correct"
-                    st.session_state["qz_correct"] += 1
-                    st.session_state["qz_index"]   += 1
-                    st.session_state["qz_revealed"] = False
-                    # 마지막 문제였으면 완료
-                    if st.session_state["qz_index"] >= total:
-                        st.session_state["qz_done"] = True
-                    st.rerun()
-
-            with btn_col2:
-                if st.button("❌ 몰랐어...", use_container_width=True):
-                    st.session_state["qz_words"][idx]["_result"] = "wrong"
-                    st.session_state["qz_wrong"] += 1
-                    st.session_state["qz_index"] += 1
-                    st.session_state["qz_revealed"] = False
-                    if st.session_state["qz_index"] >= total:
-                        st.session_state["qz_done"] = True
-                    st.rerun()
+import streamlit as st
+import pandas as pd
+import numpy as np
+import gspread
+from gspread.utils import rowcol_to_a1
+import re
+import random
+import math
+import bisect
+import heapq
+import datetime
+import threading
+import time
+import uuid
+import os
+import hashlib
+import codecs
+import sqlite3
+import json
+import html
+import logging
+import functools
+from contextlib import contextmanager
+from collections import Counter
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, as_completed
+
+# 1. 페이지 설정
+st.set_page_config(page_title="방송대 영단어장", page_icon="🎓", layout="wide")
+st.title("🎓 AI 영단어장 (V11: 퀴즈 모드 추가)")
+
+# 로컬 데이터 폴더 (분석 캐시 등)
+DATA_DIR = os.environ.get("VOCA_DATA_DIR", ".voca_data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# 1-1. 성능 측정 (디버그)
+# VOCA_DEBUG=1 환경변수나 주소 뒤 ?debug=1 로 켜짐 → 꺼져 있으면 구간 측정은 아무것도 안 함
+PROFILE_ENABLED = os.environ.get("VOCA_DEBUG") == "1" or st.query_params.get("debug") == "1"
+PROFILE_KEEP_RUNS = 50  # 세션마다 보관할 최근 rerun 수
+profile_log = logging.getLogger("voca.profile")
+if PROFILE_ENABLED and not profile_log.handlers:
+    # rerun 기록 / 내보내기 시간을 한 줄에 JSON 하나씩 stderr 로 (기본 WARNING 설정에 묻히지 않도록 따로 설정)
+    profile_handler = logging.StreamHandler()
+    profile_handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    profile_log.addHandler(profile_handler)
+    profile_log.setLevel(logging.INFO)
+    profile_log.propagate = False
+
+
+def start_profile_run(kind="full"):
+    """새 rerun 기록 시작
+    - 끝까지 못 간 이전 기록(st.stop, fragment 실행)은 마지막 구간까지를 전체 시간으로 보고 보관
+    """
+    previous = st.session_state.get("profile_run")
+    if previous is not None:
+        finish_profile_run(previous["last"])
+    st.session_state["profile_run"] = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "kind": kind,
+        "t0": time.perf_counter(),
+        "last": time.perf_counter(),
+        "spans": {},
+    }
+
+
+def finish_profile_run(ended=None):
+    run = st.session_state.pop("profile_run", None)
+    if run is None:
+        return
+    record = {
+        "started": run["started"],
+        "kind": run["kind"],
+        "total_ms": round(((ended or time.perf_counter()) - run["t0"]) * 1000, 2),
+        "spans": {name: {"ms": round(v["ms"], 2), "count": v["count"]} for name, v in run["spans"].items()},
+    }
+    runs = st.session_state.setdefault("profile_runs", [])
+    runs.append(record)
+    del runs[:-PROFILE_KEEP_RUNS]
+    profile_log.info(json.dumps(record, ensure_ascii=False))
+
+
+@contextmanager
+def span(name):
+    """구간 시간 측정: with span("storage.read"): ...
+    - 같은 이름은 한 rerun 안에서 시간과 횟수를 합산 (구간끼리 겹쳐도 각각 따로 잼)
+    """
+    if not PROFILE_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        run = st.session_state.get("profile_run")
+        if run is not None:
+            now = time.perf_counter()
+            stat = run["spans"].setdefault(name, {"ms": 0.0, "count": 0})
+            stat["ms"] += (now - started) * 1000
+            stat["count"] += 1
+            run["last"] = now
+
+
+def profiled(name):
+    """함수 전체를 구간으로 재는 데코레이터
+    - fragment 함수에 쓰면 fragment만 다시 실행될 때 그 실행을 rerun 하나로 따로 기록
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILE_ENABLED or "profile_run" in st.session_state:
+                with span(name):
+                    return func(*args, **kwargs)
+            start_profile_run("fragment")
+            try:
+                with span(name):
+                    return func(*args, **kwargs)
+            finally:
+                finish_profile_run()
+        return wrapper
+    return decorator
+
+
+def profile_summary(runs):
+    """구간별 p50/p95 (ms) → {구간: {"count", "p50_ms", "p95_ms"}}"""
+    rows = [("total", r["total_ms"]) for r in runs]
+    rows += [(name, v["ms"]) for r in runs for name, v in r["spans"].items()]
+    if not rows:
+        return {}
+    grouped = pd.DataFrame(rows, columns=["span", "ms"]).groupby("span")["ms"]
+    summary = pd.DataFrame({
+        "count": grouped.size(),
+        "p50_ms": grouped.quantile(0.5).round(2),
+        "p95_ms": grouped.quantile(0.95).round(2),
+    })
+    return summary.sort_values("p95_ms", ascending=False).to_dict(orient="index")
+
+
+def render_profile_panel():
+    """사이드바: 최근 rerun 구간별 시간 + p50/p95 + JSON 내보내기"""
+    runs = st.session_state.get("profile_runs", [])
+    with st.sidebar.expander(f"⏱️ 성능 측정 (최근 {len(runs)}회)", expanded=True):
+        if not runs:
+            st.caption("다음 rerun부터 기록이 보입니다.")
+            return
+        summary = profile_summary(runs)
+        st.dataframe(pd.DataFrame.from_dict(summary, orient="index"), use_container_width=True)
+        recent = pd.DataFrame([
+            {"시작": r["started"], "종류": r["kind"], "total": r["total_ms"],
+             **{name: v["ms"] for name, v in r["spans"].items()}}
+            for r in reversed(runs)
+        ])
+        st.dataframe(recent, use_container_width=True, hide_index=True)
+        st.download_button(
+            "📤 기록 내보내기 (JSON)",
+            data=json.dumps({"runs": runs, "summary": summary}, ensure_ascii=False, indent=2),
+            file_name="voca_profile.json",
+            mime="application/json",
+            use_container_width=True,
+        )
+        if st.button("기록 지우기", use_container_width=True):
+            st.session_state["profile_runs"] = []
+            st.rerun()
+
+
+if PROFILE_ENABLED:
+    start_profile_run()
+    render_profile_panel()
+
+# 2. Gemini 설정
+GEMINI_MODEL_NAME = 'gemini-2.5-flash-lite'
+
+try:
+    GEMINI_API_KEY = st.secrets["gemini"]["api_key"] if "gemini" in st.secrets and "api_key" in st.secrets["gemini"] else None
+except Exception:
+    GEMINI_API_KEY = None
+if not GEMINI_API_KEY:
+    st.error("🚨 Secrets에 API 키가 없습니다.")
+
+
+@st.cache_resource(show_spinner=False)
+def get_gemini_model(api_key):
+    """
+    Gemini 모델 (프로세스당 1개, 모든 세션이 공유)
+    - google.generativeai 는 처음 AI를 부를 때 import (퀴즈만 하는 세션은 불러오지 않음)
+    - 분석 스레드에서도 불리므로 스피너는 끔
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+
+GEMINI_TIMEOUT_SECONDS = 30          # 단어 1개 분석 제한 시간 (재시도 포함)
+GEMINI_MAX_ATTEMPTS = 4              # 429 / 5xx 일 때 최대 시도 횟수
+GEMINI_BACKOFF_BASE = 1.0            # 재시도 대기: 0 ~ BASE * 2^n 초 중 무작위 (최대 BACKOFF_MAX)
+GEMINI_BACKOFF_MAX = 16.0
+GEMINI_BREAKER_FAILURES = 5          # 연속 실패 N번이면 회로 차단
+GEMINI_BREAKER_COOLDOWN = 30         # 차단 후 N초 뒤 1건만 시험 호출
+GEMINI_RETRY_CODES = {429, 500, 502, 503, 504}
+GEMINI_LATENCY_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32)  # 지연 히스토그램 구간 상한(초), 마지막은 그 이상
+
+
+class GeminiUnavailable(Exception):
+    """회로 차단 중이거나 제한 시간을 넘겨 AI를 부르지 않고 바로 포기함"""
+
+
+def is_retryable(error):
+    """잠깐 기다리면 풀릴 수 있는 오류인지 (요청 한도 429 / 서버 5xx / 시간 초과 / 연결 끊김)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core 예외는 code 에 HTTP 상태 코드가 들어 있음
+    return getattr(error, "code", None) in GEMINI_RETRY_CODES
+
+
+def describe_gemini_error(error):
+    """사용자에게 보여줄 오류 설명"""
+    if isinstance(error, GeminiUnavailable):
+        return str(error)
+    if getattr(error, "code", None) == 429:
+        return "AI 요청 한도를 넘었습니다. 잠시 후 다시 시도해 주세요."
+    if is_retryable(error):
+        return f"AI 서버가 응답하지 않습니다. 잠시 후 다시 시도해 주세요. ({error})"
+    return str(error)
+
+
+class GeminiClient:
+    """
+    Gemini 호출 래퍼 (프로세스당 1개, 모든 세션/스레드가 공유)
+    - 호출마다 제한 시간: 남은 시간을 request_options 의 timeout 으로 넘김
+    - 429 / 5xx 는 지수 백오프 + 무작위 지연으로 재시도 (스트리밍은 첫 조각을 받기 전까지만)
+    - 연속 실패가 쌓이면 회로 차단 → 쿨다운 동안은 기다리지 않고 바로 GeminiUnavailable
+    - 호출 수 / 재시도 / 입력·출력 토큰 / 지연 히스토그램 집계
+    """
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.lock = threading.Lock()
+        self.failures = 0          # 연속 실패 횟수
+        self.opened_at = None      # 회로 차단 시각 (None 이면 정상)
+        self.probing = None        # 쿨다운 후 시험 호출 중이면 그 호출의 표식
+        self.calls = 0
+        self.successes = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.latency_counts = [0] * (len(GEMINI_LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+
+    def _admit(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            wait = GEMINI_BREAKER_COOLDOWN - (time.monotonic() - self.opened_at)
+            if wait > 0 or self.probing is not None:
+                self.rejected += 1
+                raise GeminiUnavailable(
+                    f"AI 서버 오류가 계속되어 잠시 호출을 멈췄습니다. {max(math.ceil(wait), 1)}초 뒤 다시 시도해 주세요."
+                )
+            self.probing = object()
+            return self.probing
+
+    def _record(self, seconds, ok, transient=False, usage=None):
+        with self.lock:
+            self.calls += 1
+            self.latency_counts[bisect.bisect_left(GEMINI_LATENCY_BUCKETS, seconds)] += 1
+            self.latency_total += seconds
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+                self.response_tokens += getattr(usage, "candidates_token_count", 0) or 0
+            if ok:
+                self.successes += 1
+                self.failures = 0
+                self.opened_at = None
+                self.probing = None
+                return
+            self.errors += 1
+            if not transient and self.probing is None:
+                # 잘못된 요청 등은 서버 상태와 무관 → 차단 판단에 넣지 않음
+                return
+            self.failures += 1
+            if self.probing is not None or self.failures >= GEMINI_BREAKER_FAILURES:
+                self.opened_at = time.monotonic()
+                self.probing = None
+
+    def _call(self, prompt, on_chunk, timeout, deadline):
+        model = get_gemini_model(self.api_key)
+        options = {"timeout": timeout}
+        if on_chunk is None:
+            response = model.generate_content(prompt, request_options=options)
+            if not response.text.strip():
+                raise ValueError("AI 응답이 비어 있습니다.")
+            return response.text, getattr(response, "usage_metadata", None)
+        parts = []
+        usage = None
+        for chunk in model.generate_content(prompt, stream=True, request_options=options):
+            # 토큰 수는 마지막 조각에 전체 합계로 들어옴
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            try:
+                text = chunk.text
+            except ValueError:
+                # 내용 없는 조각 (안전 필터 등)
+                continue
+            parts.append(text)
+            on_chunk(text)
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{GEMINI_TIMEOUT_SECONDS}초 안에 응답을 다 받지 못했습니다.")
+        if not "".join(parts).strip():
+            # 조각이 모두 막혔거나(안전 필터 등) 비어 있음 → 빈 결과를 캐시하지 않도록 실패로 처리
+            raise ValueError("AI 응답이 비어 있습니다.")
+        return "".join(parts), usage
+
+    def generate(self, prompt, on_chunk=None, before_call=None):
+        """
+        프롬프트 → 응답 원문
+        - on_chunk 가 있으면 스트리밍 (조각마다 호출)
+        - before_call 은 실제 요청 직전마다 호출 (요청 수 제한 대기용, 재시도도 1건으로 셈)
+        """
+        probe = self._admit()
+        try:
+            return self._generate(prompt, on_chunk, before_call)
+        finally:
+            # 시험 호출이 결과를 남기지 못하고 끝났으면 (st.rerun() 등) 다음 호출이 다시 시험하도록 풀어 줌
+            if probe is not None:
+                with self.lock:
+                    if self.probing is probe:
+                        self.probing = None
+
+    def _generate(self, prompt, on_chunk, before_call):
+        deadline = None
+        for attempt in range(GEMINI_MAX_ATTEMPTS):
+            if before_call is not None:
+                before_call()
+            if deadline is None:
+                # 요청 수 제한으로 기다린 시간은 제한 시간에 넣지 않음
+                deadline = time.monotonic() + GEMINI_TIMEOUT_SECONDS
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._record(0.0, False, transient=True)
+                raise GeminiUnavailable(f"AI 응답이 {GEMINI_TIMEOUT_SECONDS}초 안에 오지 않았습니다.")
+
+            started = time.monotonic()
+            streamed = []
+
+            def forward(text):
+                streamed.append(len(text))
+                on_chunk(text)
+
+            try:
+                text, usage = self._call(prompt, on_chunk and forward, remaining, deadline)
+            except Exception as e:
+                transient = is_retryable(e)
+                self._record(time.monotonic() - started, False, transient=transient)
+                delay = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+                # 이미 보여준 조각이 있으면 다시 받을 때 내용이 겹치므로 재시도 안 함
+                if (
+                    not transient or streamed or attempt + 1 >= GEMINI_MAX_ATTEMPTS
+                    or time.monotonic() + delay >= deadline
+                ):
+                    raise
+                with self.lock:
+                    if self.opened_at is not None:
+                        raise
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+            self._record(time.monotonic() - started, True, usage=usage)
+            return text
+
+    def latency_quantile(self, q):
+        """히스토그램으로 어림한 지연 분위수 (구간 상한값, 마지막 구간이면 inf)"""
+        with self.lock:
+            counts = list(self.latency_counts)
+        total = sum(counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(GEMINI_LATENCY_BUCKETS + (math.inf,), counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return math.inf
+
+    def stats(self):
+        with self.lock:
+            wait = None
+            if self.opened_at is not None:
+                wait = max(GEMINI_BREAKER_COOLDOWN - (time.monotonic() - self.opened_at), 0)
+            return {
+                "calls": self.calls,
+                "successes": self.successes,
+                "errors": self.errors,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "prompt_tokens": self.prompt_tokens,
+                "response_tokens": self.response_tokens,
+                "latency_avg": self.latency_total / self.calls if self.calls else None,
+                "latency_counts": list(self.latency_counts),
+                "breaker_wait": wait,
+            }
+
+
+def latency_label(bound):
+    if bound == math.inf:
+        return f"{GEMINI_LATENCY_BUCKETS[-1]:g}초 초과"
+    return f"≤{bound:g}초"
+
+
+@st.cache_resource
+def get_gemini_client(api_key):
+    # 차단 상태와 집계는 API 키 하나를 같이 쓰는 모든 세션이 공유
+    return GeminiClient(api_key)
+
+
+ANALYSIS_PROMPT = """
+Role: Comprehensive English-Korean Dictionary
+Input: '{word}'
+
+Task:
+1. Identify the correct word/phrase (fix typos).
+2. Select 3 distinct meanings.
+3. **CRITICAL:** If the word has multiple Parts of Speech (e.g., Noun AND Verb), YOU MUST INCLUDE BOTH TYPES.
+4. Prefix the Korean meaning with the Part of Speech tag: [명사], [동사] etc.
+
+STRICT Output Format:
+CORRECT_WORD: <Corrected Word>
+[POS] Korean Meaning @@@ English Example Sentence
+"""
+
+
+def build_analysis_prompt(word):
+    return ANALYSIS_PROMPT.format(word=word)
+
+
+class AnalysisParser:
+    """
+    AI 응답 줄 단위 파서 (스트리밍 조각을 feed()로 이어서 넣을 수 있음)
+    CORRECT_WORD: 줄과 '뜻 @@@ 예문' 줄만 사용, 완성된 줄이 들어올 때마다 바로 반영
+    """
+    def __init__(self, fallback_word):
+        self.final_word = fallback_word
+        self.meanings = []
+        self.examples = []
+        self.buffer = ""
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
+        for line in lines:
+            self._parse_line(line)
+
+    def close(self):
+        self._parse_line(self.buffer)
+        self.buffer = ""
+        return self.result()
+
+    def _parse_line(self, line):
+        line = line.strip()
+        if not line: return
+
+        if line.startswith("CORRECT_WORD:"):
+            corrected = line.split(":", 1)[1].strip()
+            if corrected:
+                self.final_word = corrected
+        elif "@@@" in line:
+            parts = line.split("@@@", 1)
+            raw_meaning = re.sub(r'^[\d\.\-\)\s]+', '', parts[0].strip())
+            raw_example = re.sub(r'^[\d\.\-\)\s]+', '', parts[1].strip())
+            n = len(self.meanings) + 1
+            self.meanings.append(f"{n}. {raw_meaning}")
+            self.examples.append(f"{n}. {raw_example}")
+
+    def result(self):
+        """(교정된 단어, 번호 붙인 뜻, 번호 붙인 예문)"""
+        return self.final_word, '\n'.join(self.meanings), '\n'.join(self.examples)
+
+
+def parse_analysis(raw_text, fallback_word):
+    parser = AnalysisParser(fallback_word)
+    parser.feed(raw_text)
+    return parser.close()
+
+
+ANALYSIS_CACHE_MAX_ROWS = 50000
+ANALYSIS_CACHE_MAX_AGE_DAYS = 180
+ANALYSIS_CACHE_EVICT_EVERY = 100  # 저장 N번마다 한 번씩 오래된 항목 정리
+
+
+def normalize_word(word):
+    return " ".join(str(word).lower().split())
+
+
+class AnalysisCache:
+    """
+    AI 분석 결과 디스크 캐시 (SQLite)
+    - 키: 모델 이름 + 프롬프트 템플릿 해시 + 정규화한 단어
+      → 프롬프트나 모델을 바꾸면 예전 결과는 자동으로 안 쓰임
+    - 오래된 항목(MAX_AGE) / 개수 초과(MAX_ROWS, 최근 사용 순)는 정리
+    - 같은 키를 여러 요청이 동시에 찾으면 AI 호출은 한 번만 하고 결과를 나눠 씀
+    """
+    def __init__(self, path, max_rows, max_age_days):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS analysis ("
+            "key TEXT PRIMARY KEY, word TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis(last_used)")
+        self.db.commit()
+        self.max_rows = max_rows
+        self.max_age = max_age_days * 86400
+        self.prefix = f"{GEMINI_MODEL_NAME}|{hashlib.sha256(ANALYSIS_PROMPT.encode()).hexdigest()[:16]}|"
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.puts = 0
+        self._evict()
+
+    def key(self, word):
+        return self.prefix + normalize_word(word)
+
+    def _get(self, key):
+        row = self.db.execute("SELECT response, created FROM analysis WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            return None
+        self.db.execute("UPDATE analysis SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return row[0]
+
+    def _put(self, key, word, response):
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO analysis (key, word, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, normalize_word(word), response, now, now)
+        )
+        self.db.commit()
+        self.puts += 1
+        if self.puts % ANALYSIS_CACHE_EVICT_EVERY == 0:
+            self._evict()
+
+    def _evict(self):
+        self.db.execute("DELETE FROM analysis WHERE created < ?", (time.time() - self.max_age,))
+        self.db.execute(
+            "DELETE FROM analysis WHERE key IN ("
+            "SELECT key FROM analysis ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+        self.db.commit()
+
+    def get_or_compute(self, word, compute):
+        key = self.key(word)
+        with self.lock:
+            cached = self._get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            try:
+                return future.result()
+            except CancelledError:
+                # 먼저 요청한 세션이 중간에 멈춤 (새로고침 등) → 이 요청이 직접 다시 시도
+                return self.get_or_compute(word, compute)
+
+        try:
+            response = compute()
+            corrected, meanings, _ = parse_analysis(response, word)
+            # 뜻을 하나도 못 읽은 응답은 돌려주기만 하고 저장하지 않음 (다음에 다시 물어봄)
+            if meanings:
+                with self.lock:
+                    self._put(key, word, response)
+                    # 오타를 고친 단어로 다시 찾아도 바로 나오도록 교정된 단어로도 저장
+                    corrected_key = self.key(corrected)
+                    if corrected_key != key:
+                        self._put(corrected_key, corrected, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # st.rerun() / st.stop() 등은 이 세션만의 일이므로 기다리던 쪽에는 취소로 알림
+            # (다시 시도하는 쪽이 같은 Future를 또 기다리지 않도록 먼저 inflight 에서 뺌)
+            self._release(key, future)
+            future.cancel()
+            raise
+        finally:
+            self._release(key, future)
+
+    def _release(self, key, future):
+        # 취소된 뒤 다시 시도한 쪽이 같은 키로 새 Future를 넣었을 수 있으므로 내 것일 때만 뺌
+        with self.lock:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def stats(self):
+        with self.lock:
+            size = self.db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "shared": self.shared, "size": size}
+
+
+@st.cache_resource
+def get_analysis_cache():
+    return AnalysisCache(
+        os.path.join(DATA_DIR, "analysis_cache.sqlite3"),
+        ANALYSIS_CACHE_MAX_ROWS,
+        ANALYSIS_CACHE_MAX_AGE_DAYS
+    )
+
+
+def analyze_word(word, before_call=None, on_chunk=None):
+    """
+    캐시를 거쳐 단어 분석 → AI 응답 원문 (캐시에 없을 때만 AI 호출)
+    on_chunk 가 있으면 스트리밍으로 받으면서 조각마다 호출 (캐시 적중 시에는 호출 안 됨)
+    """
+    def compute():
+        client = get_gemini_client(GEMINI_API_KEY)
+        return client.generate(build_analysis_prompt(word), on_chunk=on_chunk, before_call=before_call)
+
+    return get_analysis_cache().get_or_compute(word, compute)
+
+
+class RateLimiter:
+    """분당 요청 수 제한 (여러 스레드가 같이 사용, 요청 간격을 균등하게 벌림)"""
+    def __init__(self, per_minute):
+        self.lock = threading.Lock()
+        self.interval = 60.0 / per_minute
+        self.next_slot = 0.0
+
+    def set_rate(self, per_minute):
+        with self.lock:
+            self.interval = 60.0 / per_minute
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+GEMINI_RPM = 15          # 대량 분석 기본 분당 요청 수
+BULK_MAX_WORKERS = 4     # 대량 분석 동시 요청 수
+
+
+@st.cache_resource
+def get_gemini_rate_limiter():
+    # API 키 하나를 모든 세션이 같이 쓰므로 제한도 프로세스 전체에서 공유
+    return RateLimiter(GEMINI_RPM)
+
+
+def analyze_words_concurrently(words, per_minute, on_done):
+    """
+    여러 단어를 스레드 풀로 동시에 분석 (분당 per_minute 회 제한)
+    on_done(word, raw_text, error) 는 끝나는 순서대로 호출됨 (메인 스레드)
+    """
+    limiter = get_gemini_rate_limiter()
+    limiter.set_rate(per_minute)
+
+    def work(word):
+        # 캐시에 있는 단어는 요청 수 제한을 기다리지 않음
+        return analyze_word(word, before_call=limiter.wait)
+
+    pool = ThreadPoolExecutor(max_workers=BULK_MAX_WORKERS)
+    try:
+        futures = {pool.submit(work, word): word for word in words}
+        for future in as_completed(futures):
+            try:
+                on_done(futures[future], future.result(), None)
+            except Exception as e:
+                on_done(futures[future], None, e)
+    finally:
+        # 중간에 멈추면 (st.rerun() / 탭 닫기 등) 남은 단어를 다 분석할 때까지 기다리지 않고 취소
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# 3. 단어장 저장소 (구글 시트 / 로컬 SQLite / 로컬 Parquet)
+VOCA_COLUMNS = ["단어", "뜻", "예문", "과목"]
+ID_COLUMN = "ID"  # 행마다 붙는 고유 ID (행 단위 수정/삭제용)
+WORKSHEET_NAME = "Sheet1"  # 공용 단어장 (사용자 이름이 없을 때)
+USER_WORKSHEET_PREFIX = "voca_"  # 사용자별 단어장 워크시트 이름 앞부분
+USER_NAME_PATTERN = re.compile(r"^[\w-]{1,30}$")  # 한글/영문/숫자/_/- 30자까지
+SHEET_REFRESH_SECONDS = 300  # 다른 곳(다른 프로세스의 앱)에서 쓴 변경을 확인하는 주기
+SHEET_REVISION_KEY = "voca_revision"  # 워크시트마다 앱이 쓸 때마다 바꾸는 표식 (개발자 메타데이터)
+
+# "sheets": 구글 시트를 바로 사용
+# "sqlite" / "parquet": 로컬 파일에서 읽고 쓰고, 시트 설정이 있으면 SYNC_SECONDS 마다 양방향 동기화
+STORAGE_BACKEND = os.environ.get("VOCA_STORAGE", "sheets")
+SYNC_SECONDS = 60
+PARQUET_COMPACT_EVERY = 200  # Parquet 변경 기록이 이만큼 쌓이면 파일을 새로 씀
+
+# 시트 쓰기 저널 ("sheets" 사용 시): 저장은 로컬 저널에 먼저 기록하고 백그라운드에서 시트로 보냄
+JOURNAL_FLUSH_DELAY = 1.0     # 첫 변경 후 이만큼 더 모았다가 한 번에 보냄
+JOURNAL_RETRY_BASE = 2.0      # 실패 시 재시도 간격 (2, 4, 8, ... 초)
+JOURNAL_RETRY_MAX = 300.0
+
+
+def new_row_id():
+    return uuid.uuid4().hex[:12]
+
+
+def normalize_voca_frame(df):
+    """시트에서 읽은 DataFrame의 빈 행 제거 + 필수 컬럼 보정"""
+    df = df.dropna(how="all")
+    for col in VOCA_COLUMNS:
+        if col not in df.columns:
+            df[col] = "공통/기타" if col == "과목" else ""
+    return df
+
+
+def row_hash(row):
+    """동기화 비교용 행 내용 해시 (빈 값/NaN은 같은 것으로 취급)"""
+    values = [str(row.get(col)) if pd.notna(row.get(col)) else "" for col in VOCA_COLUMNS]
+    return hashlib.sha1("\x1f".join(values).encode()).hexdigest()
+
+
+class VocaStore:
+    """
+    단어장 저장소 공통 인터페이스
+    - load()              : 전체 DataFrame (index = 행 ID)
+    - get(row_id)         : 행 하나 (dict, 없으면 None)
+    - append_rows(rows)   : [(row_id, {컬럼: 값}), ...] 추가
+    - update(row_id, fields) / delete(row_id) : 행 하나만 수정/삭제
+    - write_many(updates, deletes) : 여러 행 수정/삭제를 한 번에 ({row_id: {컬럼: 값}}, [row_id, ...])
+    - modified_time()     : 바뀌었는지 확인용 값 (VocaCache 가 다시 읽을지 판단)
+    """
+    last_error = None    # 백그라운드 반영 중 마지막 오류 (없으면 None)
+    last_flush = None    # 백그라운드 반영이 마지막으로 성공한 시각 (없으면 None)
+    dropped_writes = 0   # 원본에서 행이 사라져 버린 변경 수
+
+    def load(self):
+        raise NotImplementedError
+
+    def get(self, row_id):
+        raise NotImplementedError
+
+    def append_rows(self, rows):
+        raise NotImplementedError
+
+    def append(self, row_id, row):
+        self.append_rows([(row_id, row)])
+
+    def update(self, row_id, fields):
+        raise NotImplementedError
+
+    def delete(self, row_id):
+        raise NotImplementedError
+
+    def write_many(self, updates, deletes):
+        for row_id, fields in updates.items():
+            self.update(row_id, fields)
+        for row_id in deletes:
+            self.delete(row_id)
+
+    def modified_time(self):
+        raise NotImplementedError
+
+    def pending_writes(self):
+        """아직 원본(시트)에 반영되지 않은 쓰기 수"""
+        return 0
+
+
+class SheetStore(VocaStore):
+    """
+    구글 시트를 행 단위로 읽고 쓰는 저장소 (gspread 직접 사용)
+    - 각 행은 ID 컬럼의 값으로 구분 (ID가 없는 기존 행은 처음 읽을 때 채워 넣음)
+    - 추가/수정/삭제는 해당 행만 건드리므로 단어 수와 상관없이 비용이 일정
+    - row_of 에 ID → 시트 행 번호를 기억해 두고, 쓰기 전에 ID 셀 하나만 확인
+    - 쓸 때마다 이 워크시트의 개발자 메타데이터(SHEET_REVISION_KEY)를 새 값으로 바꿈
+      → modified_time() 은 이 값이라서 다른 사용자 워크시트에 쓴 것으로는 다시 읽지 않음
+      (시트를 직접 고친 것은 바뀌지 않으므로 '🔄 새로고침'으로 반영)
+    """
+    def __init__(self, worksheet):
+        self.ws = worksheet
+        self.lock = threading.RLock()
+        self.header = []
+        self.row_of = {}
+        self.has_revision = None  # 표식 메타데이터가 이미 있는지 (None: 아직 모름)
+
+    def modified_time(self):
+        meta = self.ws.spreadsheet.fetch_sheet_metadata(params={
+            "fields": "sheets(properties.sheetId,developerMetadata(metadataKey,metadataValue))"
+        })
+        for sheet in meta.get("sheets", []):
+            if sheet["properties"]["sheetId"] != self.ws.id:
+                continue
+            for item in sheet.get("developerMetadata", []):
+                if item["metadataKey"] == SHEET_REVISION_KEY:
+                    self.has_revision = True
+                    return item["metadataValue"]
+        self.has_revision = False
+        return ""
+
+    def _revision_request(self):
+        """표식을 새 값으로 바꾸는 batch_update 요청 (다른 요청과 같이 보냄)"""
+        if self.has_revision is None:
+            self.modified_time()
+        value = new_row_id()
+        if self.has_revision:
+            return {"updateDeveloperMetadata": {
+                "dataFilters": [{"developerMetadataLookup": {
+                    "metadataKey": SHEET_REVISION_KEY, "metadataLocation": {"sheetId": self.ws.id}
+                }}],
+                "developerMetadata": {"metadataValue": value},
+                "fields": "metadataValue",
+            }}
+        self.has_revision = True
+        return {"createDeveloperMetadata": {"developerMetadata": {
+            "metadataKey": SHEET_REVISION_KEY, "metadataValue": value,
+            "location": {"sheetId": self.ws.id}, "visibility": "DOCUMENT",
+        }}}
+
+    def _bump_revision(self, requests=()):
+        self.ws.spreadsheet.batch_update({"requests": [*requests, self._revision_request()]})
+
+    def load(self):
+        with self.lock:
+            values = self.ws.get_all_values()
+            header = values[0] if values else []
+            missing_cols = [c for c in [ID_COLUMN] + VOCA_COLUMNS if c not in header]
+            if missing_cols:
+                header = header + missing_cols
+                if len(header) > self.ws.col_count:
+                    self.ws.add_cols(len(header) - self.ws.col_count)
+                self.ws.update(range_name="A1", values=[header])
+            self.header = header
+            id_col = header.index(ID_COLUMN)
+
+            records, ids, id_fixes = [], [], []
+            self.row_of = {}
+            for row_num, row in enumerate(values[1:], start=2):
+                row = row + [""] * (len(header) - len(row))
+                if not any(row):
+                    continue
+                row_id = row[id_col]
+                if not row_id or row_id in self.row_of:
+                    row_id = new_row_id()
+                    id_fixes.append({"range": rowcol_to_a1(row_num, id_col + 1), "values": [[row_id]]})
+                self.row_of[row_id] = row_num
+                ids.append(row_id)
+                records.append(row)
+
+            # ID가 없던 행은 한 번의 배치 요청으로 채움 (최초 1회)
+            if id_fixes:
+                self.ws.batch_update(id_fixes)
+
+            df = pd.DataFrame(records, columns=header, index=pd.Index(ids, name=ID_COLUMN))
+            df = df.drop(columns=[ID_COLUMN])
+            return normalize_voca_frame(df.mask(df == ""))
+
+    def _row_values(self, row_id, row):
+        return [row_id if col == ID_COLUMN else row.get(col, "") for col in self.header]
+
+    def _refresh_row_numbers(self):
+        id_col = self.header.index(ID_COLUMN) + 1
+        ids = self.ws.col_values(id_col)
+        self.row_of = {row_id: n for n, row_id in enumerate(ids, start=1) if n > 1 and row_id}
+
+    def _locate(self, row_id):
+        """ID로 시트 행 번호 찾기 (셀 1개 확인, 어긋나 있으면 ID 컬럼만 다시 읽음)"""
+        id_col = self.header.index(ID_COLUMN) + 1
+        row_num = self.row_of.get(row_id)
+        if row_num is not None and self.ws.acell(rowcol_to_a1(row_num, id_col)).value == row_id:
+            return row_num
+        self._refresh_row_numbers()
+        if row_id not in self.row_of:
+            raise KeyError(f"시트에서 행을 찾을 수 없습니다: {row_id}")
+        return self.row_of[row_id]
+
+    def append_rows(self, rows):
+        """rows: [(row_id, {컬럼: 값}), ...] → 요청 1번으로 시트 끝에 추가"""
+        with self.lock:
+            values = [self._row_values(row_id, row) for row_id, row in rows]
+            response = self.ws.append_rows(values, value_input_option="RAW", table_range="A1")
+            updated_range = response.get("updates", {}).get("updatedRange", "")
+            match = re.search(r"![A-Z]+(\d+)", updated_range)
+            if match:
+                first_row = int(match.group(1))
+                for offset, (row_id, _) in enumerate(rows):
+                    self.row_of[row_id] = first_row + offset
+            else:
+                self._refresh_row_numbers()
+            self._bump_revision()
+
+    def get(self, row_id):
+        with self.lock:
+            values = self.ws.row_values(self._locate(row_id))
+            values += [""] * (len(self.header) - len(values))
+            return {col: values[k] for k, col in enumerate(self.header) if col != ID_COLUMN}
+
+    def update(self, row_id, fields):
+        if self.update_many({row_id: fields}):
+            raise KeyError(f"시트에서 행을 찾을 수 없습니다: {row_id}")
+
+    def update_many(self, updates):
+        """{row_id: {컬럼: 값}} → batch_update 요청 1번, 시트에서 못 찾은 행 ID 목록을 돌려줌"""
+        with self.lock:
+            if len(updates) == 1:
+                row_nums = {}
+                for row_id in updates:
+                    try:
+                        row_nums[row_id] = self._locate(row_id)
+                    except KeyError:
+                        pass
+            else:
+                # 여러 행이면 셀마다 확인하지 않고 ID 컬럼을 한 번 읽어서 행 번호를 맞춤
+                self._refresh_row_numbers()
+                row_nums = {row_id: self.row_of[row_id] for row_id in updates if row_id in self.row_of}
+            data = [
+                {"range": rowcol_to_a1(row_nums[row_id], self.header.index(col) + 1), "values": [[value]]}
+                for row_id, fields in updates.items() if row_id in row_nums
+                for col, value in fields.items()
+            ]
+            if data:
+                self.ws.batch_update(data)
+                self._bump_revision()
+            return [row_id for row_id in updates if row_id not in row_nums]
+
+    def delete_many(self, row_ids):
+        """여러 행 삭제를 요청 1번으로 (아래 행부터 지워야 번호가 안 밀림, 시트에 이미 없는 행은 건너뜀)"""
+        with self.lock:
+            located = {}
+            for row_id in row_ids:
+                try:
+                    located[row_id] = self._locate(row_id)
+                except KeyError:
+                    continue
+            if not located:
+                return
+            row_nums = sorted(located.values(), reverse=True)
+            # 표식 갱신도 같은 요청에 넣어서 보냄
+            self._bump_revision([
+                {"deleteDimension": {"range": {
+                    "sheetId": self.ws.id, "dimension": "ROWS",
+                    "startIndex": row_num - 1, "endIndex": row_num
+                }}}
+                for row_num in row_nums
+            ])
+            # 지운 행보다 아래 있던 행은 지운 개수만큼 번호를 당김 (ID 컬럼을 다시 읽지 않음)
+            for row_id in located:
+                del self.row_of[row_id]
+            row_nums.reverse()
+            for other_id, n in self.row_of.items():
+                shift = bisect.bisect_left(row_nums, n)
+                if shift:
+                    self.row_of[other_id] = n - shift
+
+    def write_many(self, updates, deletes):
+        if updates:
+            self.update_many(updates)
+        if deletes:
+            self.delete_many(deletes)
+
+    def delete(self, row_id):
+        with self.lock:
+            row_num = self._locate(row_id)
+            self.ws.delete_rows(row_num)
+            self._bump_revision()
+            del self.row_of[row_id]
+            for other_id, n in self.row_of.items():
+                if n > row_num:
+                    self.row_of[other_id] = n - 1
+
+
+def worksheet_for_user(user):
+    """사용자 이름 → 그 사용자의 단어장 워크시트 이름 (이름이 없으면 공용 단어장)"""
+    return f"{USER_WORKSHEET_PREFIX}{user}" if user else WORKSHEET_NAME
+
+
+@st.cache_resource
+def get_spreadsheet():
+    """
+    구글 스프레드시트 (프로세스당 1개)
+    - 인증된 gspread 클라이언트(HTTP 세션)를 모든 사용자/워크시트가 같이 씀
+    """
+    # secrets 형식은 기존 st-gsheets-connection 설정([connections.gsheets])을 그대로 사용
+    info = st.secrets["connections"]["gsheets"].to_dict()
+    spreadsheet = info.pop("spreadsheet")
+    info.pop("worksheet", None)
+    client = gspread.service_account_from_dict(info)
+    if spreadsheet.startswith("http"):
+        return client.open_by_url(spreadsheet)
+    return client.open(spreadsheet)
+
+
+def has_sheet_config():
+    """secrets 에 [connections.gsheets] 설정이 있는지"""
+    try:
+        return "gsheets" in st.secrets.get("connections", {})
+    except Exception:
+        return False
+
+
+@st.cache_resource
+def get_sheet_store(worksheet_name):
+    book = get_spreadsheet()
+    try:
+        worksheet = book.worksheet(worksheet_name)
+    except gspread.WorksheetNotFound:
+        # 처음 온 사용자 → 빈 워크시트를 만들고 헤더는 load()에서 채움
+        worksheet = book.add_worksheet(title=worksheet_name, rows=1000, cols=len(VOCA_COLUMNS) + 1)
+    return SheetStore(worksheet)
+
+
+def text_of(value):
+    return str(value).lower() if pd.notna(value) else ""
+
+
+def english_tokens(text):
+    return re.findall(r"[a-z0-9']+", text)
+
+
+def deletes1(word):
+    """한 글자씩 지운 변형들 (오타 허용 검색용, SymSpell 방식)"""
+    return {word[:k] + word[k + 1:] for k in range(len(word))}
+
+
+class SearchIndex:
+    """
+    단어/뜻/예문 검색 인덱스 (행 추가/수정/삭제 시 그 행만 갱신)
+    - 단어, 예문 : 영어 토큰 → 행 ID, 정렬된 토큰 목록으로 접두어 검색
+    - 뜻         : 글자 1-gram/2-gram → 행 ID (한글 부분 검색)
+    - 오타 허용  : 단어에서 한 글자 지운 변형 → 행 ID
+    결과는 관련도(단어 일치 > 단어 접두어 > 단어 포함 > 뜻 > 예문 > 오타) 순,
+    같은 그룹 안에서는 짧은 단어 먼저
+    """
+    def __init__(self):
+        self.docs = {}             # 행 ID → (단어, 뜻, 예문) 소문자
+        self.word_len = {}         # 행 ID → 단어 길이 (같은 점수면 짧은 단어 먼저)
+        self.word_tokens = {}      # 토큰 → {행 ID}
+        self.example_tokens = {}
+        self.sorted_tokens = []    # 두 토큰 사전의 키를 정렬해 둔 목록
+        self.grams = {}            # 뜻 n-gram → {행 ID}
+        self.word_deletes = {}     # 단어 / 단어에서 한 글자 지운 것 → {행 ID}
+
+    def build(self, df):
+        for row_id, word, meaning, example in zip(df.index, df["단어"], df["뜻"], df["예문"]):
+            self._index(row_id, text_of(word).strip(), text_of(meaning), text_of(example), sort=False)
+        self.sorted_tokens = sorted(set(self.word_tokens) | set(self.example_tokens))
+
+    @staticmethod
+    def _meaning_grams(meaning):
+        return set(meaning) | {meaning[k:k + 2] for k in range(len(meaning) - 1)}
+
+    def _add_token(self, postings, token, row_id, sort):
+        if token not in postings:
+            postings[token] = set()
+            if sort:
+                pos = bisect.bisect_left(self.sorted_tokens, token)
+                if pos == len(self.sorted_tokens) or self.sorted_tokens[pos] != token:
+                    self.sorted_tokens.insert(pos, token)
+        postings[token].add(row_id)
+
+    def _index(self, row_id, word, meaning, example, sort=True):
+        self.docs[row_id] = (word, meaning, example)
+        self.word_len[row_id] = len(word)
+        for token in set(english_tokens(word)):
+            self._add_token(self.word_tokens, token, row_id, sort)
+        for token in set(english_tokens(example)):
+            self._add_token(self.example_tokens, token, row_id, sort)
+        for gram in self._meaning_grams(meaning):
+            self.grams.setdefault(gram, set()).add(row_id)
+        for variant in deletes1(word) | {word}:
+            self.word_deletes.setdefault(variant, set()).add(row_id)
+
+    @staticmethod
+    def _discard(postings, key, row_id):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(row_id)
+            if not ids:
+                del postings[key]
+
+    def add(self, row_id, row):
+        self.remove(row_id)
+        self._index(row_id, text_of(row.get("단어")).strip(), text_of(row.get("뜻")), text_of(row.get("예문")))
+
+    def remove(self, row_id):
+        doc = self.docs.pop(row_id, None)
+        if doc is None:
+            return
+        del self.word_len[row_id]
+        word, meaning, example = doc
+        for token in set(english_tokens(word)):
+            self._discard(self.word_tokens, token, row_id)
+        for token in set(english_tokens(example)):
+            self._discard(self.example_tokens, token, row_id)
+        for gram in self._meaning_grams(meaning):
+            self._discard(self.grams, gram, row_id)
+        for variant in deletes1(word) | {word}:
+            self._discard(self.word_deletes, variant, row_id)
+        # sorted_tokens 에 남은 빈 토큰은 검색 시 postings 가 없어서 자연히 무시됨
+
+    def _prefix_ids(self, postings, prefix):
+        ids = set()
+        pos = bisect.bisect_left(self.sorted_tokens, prefix)
+        while pos < len(self.sorted_tokens) and self.sorted_tokens[pos].startswith(prefix):
+            ids |= postings.get(self.sorted_tokens[pos], set())
+            pos += 1
+        return ids
+
+    def _token_candidates(self, postings, tokens):
+        """모든 질의 토큰이 (접두어로) 들어 있는 행"""
+        candidates = None
+        for token in tokens:
+            ids = self._prefix_ids(postings, token)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        return candidates or set()
+
+    def search(self, query, fuzzy=False):
+        q = " ".join(query.lower().split())
+        if not q:
+            return []
+        results = []
+        seen = set()
+
+        def take(ids):
+            # 점수가 높은 그룹부터 호출 → 처음 나온 그룹이 그 행의 점수
+            new_ids = set(ids) - seen
+            seen.update(new_ids)
+            results.extend(sorted(new_ids, key=self.word_len.__getitem__))
+
+        tokens = english_tokens(q)
+        # 질의가 토큰 하나면 접두어 일치 = 포함이 보장되므로 확인 생략
+        single_token = tokens == [q]
+        if tokens:
+            exact, prefix, inner, partial = [], [], [], []
+            for row_id in self._token_candidates(self.word_tokens, tokens):
+                word = self.docs[row_id][0]
+                if word == q:
+                    exact.append(row_id)
+                elif word.startswith(q):
+                    prefix.append(row_id)
+                elif q in word:
+                    inner.append(row_id)
+                else:
+                    partial.append(row_id)
+            take(exact)
+            take(prefix)
+            take(inner)
+            take(partial)
+
+        # 뜻: n-gram 교집합으로 후보를 줄인 뒤 (3글자 이상이면) 실제 포함 여부 확인
+        if len(q) <= 2:
+            take(self.grams.get(q, ()))
+        else:
+            meaning_ids = None
+            for k in range(len(q) - 1):
+                ids = self.grams.get(q[k:k + 2], set())
+                meaning_ids = ids if meaning_ids is None else meaning_ids & ids
+                if not meaning_ids:
+                    break
+            take(row_id for row_id in meaning_ids if row_id not in seen and q in self.docs[row_id][1])
+
+        if tokens:
+            example_ids = self._token_candidates(self.example_tokens, tokens)
+            if single_token:
+                take(example_ids)
+            else:
+                take(row_id for row_id in example_ids if row_id not in seen and q in self.docs[row_id][2])
+
+        # 오타 허용: 한 글자 삭제 변형이 겹치는 단어 (편집 거리 1~2)
+        if fuzzy and len(q) >= 3:
+            for variant in deletes1(q) | {q}:
+                take(self.word_deletes.get(variant, ()))
+
+        return results
+
+
+WORD_KEY_SKIP = {"to", "a", "an", "the"}  # 앞에 붙어도 같은 단어로 보는 말
+UNDOUBLE_LETTERS = set("bdgmnprt")  # stopped → stop, running → run
+LEMMA_VOWELS = set("aeiouy")
+# 어미처럼 보이지만 그 자체로 다른 단어라서 어간 처리하지 않음 (news ≠ new, evening ≠ even)
+LEMMA_KEEP = {
+    "news", "goods", "means", "does", "series", "species", "physics", "always", "perhaps",
+    "evening", "morning", "wedding", "during", "ceiling", "pudding", "herring", "earring",
+    "inning", "outing", "hundred", "kindred", "naked", "wicked", "sacred",
+}
+DUPLICATE_TYPO_MIN_LEN = 5  # 철자 한 글자 차이는 이 길이 이상인 단어만
+DUPLICATE_TYPO_BUCKET_MAX = 5  # 한 변형을 이보다 많은 단어가 공유하면 흔한 조각이라 무시
+
+
+def lemma(token):
+    """간단한 어간 처리: addresses / addressed / addressing → address"""
+    if len(token) <= 3 or token in LEMMA_KEEP:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("ied") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    if token.endswith("eed"):
+        # speed / proceed / need 는 -ed 가 아님
+        return token
+    for suffix in ("ing", "ed"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            stem = token[:-len(suffix)]
+            if not LEMMA_VOWELS & set(stem):
+                # string → str 처럼 모음이 없으면 어간이 아님
+                return token
+            if stem[-1] == stem[-2] and stem[-1] in UNDOUBLE_LETTERS:
+                # hopped → hop
+                return stem[:-1]
+            if re.search(r"([^aeiou]at|bl|iz)$", stem) or short_stem(stem):
+                # 빠진 e 되살림: related → relate, troubled → trouble, hoped / hoping → hope
+                return stem + "e"
+            return stem
+    return token
+
+
+def short_stem(stem):
+    """모음 덩어리가 하나이고 자음-모음-자음으로 끝나는 어간 (hop, lik, cod) → 원형은 보통 e 로 끝남"""
+    return (
+        len(re.findall(r"[aeiou]+", stem)) == 1
+        and stem[-1] not in "aeiouwxy" and stem[-2] in "aeiou" and stem[-3] not in "aeiou"
+    )
+
+
+def word_key(word):
+    """중복 확인용 정규화 키 (대소문자/공백/하이픈/앞의 to·a·the 무시 + 단어마다 어간 처리)"""
+    tokens = re.findall(r"[a-z0-9']+", str(word).casefold().replace("-", " "))
+    while len(tokens) > 1 and tokens[0] in WORD_KEY_SKIP:
+        tokens = tokens[1:]
+    return " ".join(lemma(t) for t in tokens) or normalize_word(word)
+
+
+class DuplicateIndex:
+    """
+    단어 중복 확인용 해시 인덱스 (정규화 키 → 행 ID)
+    - find(word)    : 같은 키를 가진 행 ID 목록 (Address / addresses 등) → O(1)
+    - has_exact(word): 대소문자/공백만 다른 완전히 같은 단어가 있는지 → O(1)
+    - has_key(key)  : 이미 정규화한 키로 확인
+    - clusters()    : 같은 키끼리 (+ 철자 한 글자 차이) 묶은 중복 후보
+    """
+
+    def __init__(self):
+        self.ids = {}         # 키 → {행 ID: 단어}
+        self.key_of = {}      # 행 ID → 키
+        self.exact = {}       # normalize_word(단어) → 개수
+
+    def build(self, df):
+        for row_id, word in zip(df.index, df["단어"]):
+            if pd.notna(word):
+                self.add(row_id, word)
+
+    def add(self, row_id, word):
+        self.remove(row_id)
+        word = str(word).strip()
+        key = word_key(word)
+        self.ids.setdefault(key, {})[row_id] = word
+        self.key_of[row_id] = key
+        norm = normalize_word(word)
+        self.exact[norm] = self.exact.get(norm, 0) + 1
+
+    def remove(self, row_id):
+        key = self.key_of.pop(row_id, None)
+        if key is None:
+            return
+        word = self.ids[key].pop(row_id)
+        if not self.ids[key]:
+            del self.ids[key]
+        norm = normalize_word(word)
+        self.exact[norm] -= 1
+        if not self.exact[norm]:
+            del self.exact[norm]
+
+    def find(self, word):
+        """{행 ID: 단어} (같은 키)"""
+        return dict(self.ids.get(word_key(word), {}))
+
+    def has_exact(self, word):
+        return normalize_word(word) in self.exact
+
+    def has_key(self, key):
+        return key in self.ids
+
+    def clusters(self, typo=False):
+        """
+        중복 후보 묶음 → [(종류, [행 ID, ...]), ...]
+        종류: "exact" (대소문자/공백만 다름) / "same" (같은 키, 활용형 등) / "typo" (철자 차이 포함)
+        - typo=True 면 한 글자 지운 변형을 공유하는 키끼리도 묶음 (SymSpell 방식, union-find)
+        """
+        keys = list(self.ids)
+        parent = {k: k for k in keys}
+
+        def root(k):
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
+
+        if typo:
+            buckets = {}
+            for key in keys:
+                if len(key) >= DUPLICATE_TYPO_MIN_LEN and " " not in key:
+                    for variant in deletes1(key) | {key}:
+                        buckets.setdefault(variant, []).append(key)
+            for bucket in buckets.values():
+                if 1 < len(bucket) <= DUPLICATE_TYPO_BUCKET_MAX:
+                    for other in bucket[1:]:
+                        a, b = root(bucket[0]), root(other)
+                        if a != b:
+                            parent[b] = a
+
+        groups = {}
+        for key in keys:
+            groups.setdefault(root(key), []).append(key)
+        result = []
+        for group in groups.values():
+            row_ids = [row_id for key in group for row_id in self.ids[key]]
+            if len(row_ids) > 1:
+                if len(group) > 1:
+                    kind = "typo"
+                elif len({normalize_word(self.ids[group[0]][row_id]) for row_id in row_ids}) == 1:
+                    kind = "exact"
+                else:
+                    kind = "same"
+                result.append((kind, row_ids))
+        return result
+
+
+def merge_numbered(values):
+    """여러 칸의 '1. ...' 줄들을 겹치는 줄 없이 합쳐서 번호를 다시 매김"""
+    seen = set()
+    lines = []
+    for value in values:
+        if pd.isna(value):
+            continue
+        for line in str(value).splitlines():
+            body = re.sub(r"^\s*\d+\.\s*", "", line).strip()
+            key = normalize_word(body)
+            if body and key not in seen:
+                seen.add(key)
+                lines.append(body)
+    return "\n".join(f"{n}. {body}" for n, body in enumerate(lines, 1))
+
+
+def merge_order(data, row_ids, keep=None, longest=False):
+    """
+    중복 묶음 하나 → [남길 행 ID, 합칠 행 ID, ...] (지워진 행은 빼고, 2개 미만이면 None)
+    - keep 이 있으면 그 행을 남김
+    - 없으면 가장 짧은 단어(원형일 가능성이 큼), 같으면 먼저 추가된 행을 남김
+    - longest=True (철자 차이 묶음) 면 가장 긴 단어 (adress / address 는 빠진 글자가 있는 쪽이 오타)
+    """
+    row_ids = [row_id for row_id in row_ids if row_id in data.index]
+    if len(row_ids) < 2:
+        return None
+    if keep in row_ids:
+        n = row_ids.index(keep)
+    else:
+        sign = -1 if longest else 1
+        n = min(range(len(row_ids)), key=lambda k: (sign * len(str(data.at[row_ids[k], "단어"])), k))
+    return [row_ids[n]] + row_ids[:n] + row_ids[n + 1:]
+
+
+def plan_merge(data, row_ids, keep=None):
+    """
+    중복 묶음 하나 → (남길 행 ID, 고칠 내용, 지울 행 ID 목록)
+    - 뜻/예문은 겹치는 줄을 빼고 합침, 과목은 남기는 행 것
+    """
+    ordered = merge_order(data, row_ids, keep)
+    if ordered is None:
+        return None
+    fields = {
+        "뜻": merge_numbered(data.at[row_id, "뜻"] for row_id in ordered),
+        "예문": merge_numbered(data.at[row_id, "예문"] for row_id in ordered),
+    }
+    return ordered[0], fields, ordered[1:]
+
+
+class VocaCache:
+    """
+    모든 세션이 같이 쓰는 단어장 캐시 (프로세스당 1개)
+    - data    : 단어장 DataFrame (index = 행 ID, 세션들은 읽기 전용으로 사용)
+    - version : 내용이 바뀔 때마다 1씩 증가
+    - 앱 안에서 추가/수정/삭제하면 캐시도 바로 갱신 (write-through)
+    - SHEET_REFRESH_SECONDS 마다 워크시트 변경 표식(modified_time)을 확인해서 바뀌었을 때만 다시 읽음
+    - changes : 최근 바뀐 행 ID 기록 → 다른 인덱스들이 changes_since()로 변경분만 따라잡음
+    - dupes   : 단어 중복 확인 인덱스 (DuplicateIndex)
+    """
+    MAX_CHANGES = 1000
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()
+        self.data = None
+        self.dupes = DuplicateIndex()
+        self.search = SearchIndex()
+        self.version = 0
+        self.base_version = 0
+        self.changes = []
+        self.modified = None
+        self.checked_at = 0.0
+
+    def _remote_modified_time(self):
+        try:
+            return self.store.modified_time()
+        except Exception:
+            return None
+
+    def get(self):
+        with self.lock:
+            if self.data is not None and time.time() - self.checked_at > SHEET_REFRESH_SECONDS:
+                modified = self._remote_modified_time()
+                self.checked_at = time.time()
+                # 확인 자체가 실패하면 (네트워크 순단 등) 지금 캐시를 그대로 쓰고 다음 주기에 다시 확인
+                if modified is not None and modified != self.modified:
+                    self.data = None
+            if self.data is None:
+                self.modified = self._remote_modified_time()
+                self.replace(self.store.load())
+                self.checked_at = time.time()
+            return self.data
+
+    def replace(self, df):
+        with self.lock:
+            self.data = df
+            self.dupes = DuplicateIndex()
+            self.dupes.build(df)
+            self.search = SearchIndex()
+            self.search.build(df)
+            self.version += 1
+            self.base_version = self.version
+            self.changes = []
+
+    def _changed(self, row_ids):
+        self.version += 1
+        self.changes.extend((self.version, row_id) for row_id in row_ids)
+        if len(self.changes) > self.MAX_CHANGES:
+            self.changes = self.changes[-self.MAX_CHANGES:]
+
+    def changes_since(self, version):
+        """version 이후 바뀐 행 ID 목록 (전체를 다시 읽었거나 기록이 잘렸으면 None)"""
+        with self.lock:
+            if version < self.base_version:
+                return None
+            if self.changes and version < self.changes[0][0] - 1:
+                return None
+            return [row_id for v, row_id in self.changes if v > version]
+
+    def invalidate(self):
+        with self.lock:
+            self.data = None
+
+    def append_rows(self, rows):
+        with self.lock:
+            new_entries = pd.DataFrame(
+                [row for _, row in rows],
+                index=pd.Index([row_id for row_id, _ in rows], name=ID_COLUMN)
+            )
+            self.data = pd.concat([self.data, new_entries])
+            for row_id, row in rows:
+                self.search.add(row_id, row)
+                self.dupes.add(row_id, row["단어"])
+            self._changed([row_id for row_id, _ in rows])
+
+    def append(self, row_id, row):
+        self.append_rows([(row_id, row)])
+
+    def update(self, row_id, fields):
+        self.write_many({row_id: fields}, [])
+
+    def delete(self, row_id):
+        self.write_many({}, [row_id])
+
+    def write_many(self, updates, deletes):
+        """여러 행 수정/삭제를 DataFrame 복사 한 번으로"""
+        with self.lock:
+            # 다른 세션이 보고 있는 DataFrame은 건드리지 않도록 복사 후 교체
+            deletes = [row_id for row_id in deletes if row_id in self.data.index]
+            df = self.data.drop(index=deletes)
+            for row_id, fields in updates.items():
+                for col, value in fields.items():
+                    df.at[row_id, col] = value
+            self.data = df
+            for row_id in deletes:
+                self.search.remove(row_id)
+                self.dupes.remove(row_id)
+            for row_id in updates:
+                row = df.loc[row_id].to_dict()
+                self.search.add(row_id, row)
+                self.dupes.add(row_id, row["단어"])
+            self._changed(list(updates) + deletes)
+
+
+def coalesce_ops(ops):
+    """
+    [(row_id, op, fields), ...] (순서대로) → 행마다 마지막 상태 하나로 합침
+    - 추가 후 수정 → 수정 내용을 합친 추가 / 추가 후 삭제 → 아무것도 안 함
+    - 여러 번 수정 → 한 번 수정 / 수정 후 삭제 → 삭제
+    """
+    merged = {}
+    for row_id, op, fields in ops:
+        prev = merged.get(row_id)
+        if op == "append":
+            merged[row_id] = ("append", dict(fields))
+        elif op == "update":
+            if prev is None:
+                merged[row_id] = ("update", dict(fields))
+            elif prev[0] != "delete":
+                merged[row_id] = (prev[0], {**prev[1], **fields})
+        elif op == "delete":
+            if prev is not None and prev[0] == "append":
+                merged[row_id] = None
+            else:
+                merged[row_id] = ("delete", {})
+    return {row_id: change for row_id, change in merged.items() if change is not None}
+
+
+class JournaledStore(VocaStore):
+    """
+    시트 쓰기를 로컬 저널(SQLite)에 먼저 기록하고 바로 돌려주는 저장소 (write-behind)
+    - 백그라운드 스레드가 쌓인 변경을 행마다 합쳐서 추가/수정/삭제 배치 요청으로 보냄
+    - 실패하면 저널에 그대로 남겨 두고 점점 길게 기다렸다가 재시도 (앱을 껐다 켜도 남아 있음)
+    - load() 는 시트 내용 위에 아직 안 보낸 변경을 덮어서 돌려줌
+    """
+    def __init__(self, remote, path):
+        self.remote = remote
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, row_id TEXT, op TEXT, fields TEXT, created REAL)"
+        )
+        self.db.commit()
+        self.wakeup = threading.Event()
+        # 시트 헤더/행 번호는 remote.load() 가 채우므로 처음 읽기가 끝나야 보내기 시작
+        # (지난번에 못 보낸 변경도 그때 보냄)
+        self.ready = threading.Event()
+        self.last_error = None
+        self.last_flush = None
+        self.retry_delay = 0.0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _record(self, entries):
+        with self.lock:
+            self.db.executemany(
+                "INSERT INTO journal (row_id, op, fields, created) VALUES (?, ?, ?, ?)",
+                [(row_id, op, json.dumps(fields, ensure_ascii=False), time.time()) for row_id, op, fields in entries]
+            )
+            self.db.commit()
+        self.wakeup.set()
+
+    def _pending_ops(self):
+        with self.lock:
+            rows = self.db.execute("SELECT seq, row_id, op, fields FROM journal ORDER BY seq").fetchall()
+        return rows
+
+    def pending_writes(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(DISTINCT row_id) FROM journal").fetchone()[0]
+
+    def append_rows(self, rows):
+        self._record([(row_id, "append", {col: row.get(col) for col in VOCA_COLUMNS}) for row_id, row in rows])
+
+    def update(self, row_id, fields):
+        self._record([(row_id, "update", fields)])
+
+    def delete(self, row_id):
+        self._record([(row_id, "delete", {})])
+
+    def write_many(self, updates, deletes):
+        # 한 트랜잭션으로 기록 → 다음 flush 때 update_many / delete_many 한 번씩으로 나감
+        self._record(
+            [(row_id, "update", fields) for row_id, fields in updates.items()]
+            + [(row_id, "delete", {}) for row_id in deletes]
+        )
+
+    def modified_time(self):
+        return self.remote.modified_time()
+
+    def get(self, row_id):
+        changes = coalesce_ops(
+            [(r_id, op, json.loads(fields)) for _, r_id, op, fields in self._pending_ops() if r_id == row_id]
+        )
+        change = changes.get(row_id)
+        if change is not None and change[0] == "delete":
+            return None
+        if change is not None and change[0] == "append":
+            return change[1]
+        row = self.remote.get(row_id)
+        return {**row, **change[1]} if change is not None else row
+
+    def load(self):
+        # 저널을 먼저 읽음: 시트를 읽는 동안 보내진 변경은 시트 쪽에 없더라도 여기에는 남아 있음
+        # (이미 시트에 반영된 변경을 한 번 더 덮어도 결과는 같음)
+        pending = self._pending_ops()
+        df = self.remote.load()
+        if not self.ready.is_set():
+            self.ready.set()
+            self.wakeup.set()
+        changes = coalesce_ops([(row_id, op, json.loads(fields)) for _, row_id, op, fields in pending])
+        if not changes:
+            return df
+        deleted = [row_id for row_id, (op, _) in changes.items() if op == "delete" and row_id in df.index]
+        df = df.drop(index=deleted)
+        for row_id, (op, fields) in changes.items():
+            if op == "update" and row_id in df.index:
+                for col, value in fields.items():
+                    df.at[row_id, col] = value
+        appended = [(row_id, fields) for row_id, (op, fields) in changes.items() if op == "append" and row_id not in df.index]
+        if appended:
+            df = pd.concat([df, pd.DataFrame(
+                [fields for _, fields in appended],
+                index=pd.Index([row_id for row_id, _ in appended], name=ID_COLUMN)
+            )])
+        return df
+
+    def _done(self, row_ids, max_seq):
+        with self.lock:
+            self.db.executemany(
+                "DELETE FROM journal WHERE row_id = ? AND seq <= ?",
+                [(row_id, max_seq) for row_id in row_ids]
+            )
+            self.db.commit()
+
+    def flush(self):
+        """쌓인 변경을 시트에 보냄 → 보낸 행 수 (실패하면 예외, 보낸 부분까지는 저널에서 지움)"""
+        pending = self._pending_ops()
+        if not pending:
+            return 0
+        max_seq = pending[-1][0]
+        changes = coalesce_ops([(row_id, op, json.loads(fields)) for _, row_id, op, fields in pending])
+
+        # 합쳐서 아무것도 안 해도 되는 행(추가 후 삭제)은 바로 정리
+        noop = {row_id for _, row_id, _, _ in pending} - set(changes)
+        if noop:
+            self._done(noop, max_seq)
+
+        new_rows = [(row_id, fields) for row_id, (op, fields) in changes.items() if op == "append"]
+        updates = {row_id: fields for row_id, (op, fields) in changes.items() if op == "update"}
+        deletes = [row_id for row_id, (op, _) in changes.items() if op == "delete"]
+
+        # 종류별로 따로 보내고 성공한 것부터 저널에서 지움
+        # (한 종류가 실패해도 나머지는 보내고, 중간에 실패해도 중복 추가가 안 생김)
+        error = None
+        if new_rows:
+            try:
+                self.remote.append_rows(new_rows)
+                self._done([row_id for row_id, _ in new_rows], max_seq)
+            except Exception as e:
+                error = error or e
+        if updates:
+            try:
+                missing = self.remote.update_many(updates)
+                self._done(list(updates), max_seq)
+                if missing:
+                    # 시트에서 지워진 행 → 다시 보내도 계속 실패하므로 버림
+                    self.dropped_writes += len(missing)
+                    logging.getLogger("voca.journal").warning("시트에 없는 행의 수정을 버림: %s", missing)
+            except Exception as e:
+                error = error or e
+        if deletes:
+            try:
+                # 시트에 이미 없는 행은 delete_many 가 건너뜀
+                self.remote.delete_many(deletes)
+                self._done(deletes, max_seq)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return len(changes)
+
+    def _run(self):
+        self.ready.wait()
+        while True:
+            self.wakeup.wait()
+            # 잠깐 더 모았다가 한 번에 보냄
+            time.sleep(JOURNAL_FLUSH_DELAY)
+            self.wakeup.clear()
+            try:
+                self.flush()
+                self.last_error = None
+                self.last_flush = time.time()
+                self.retry_delay = 0.0
+            except Exception as e:
+                self.last_error = e
+                self.retry_delay = min(JOURNAL_RETRY_MAX, max(JOURNAL_RETRY_BASE, self.retry_delay * 2))
+                time.sleep(random.uniform(self.retry_delay / 2, self.retry_delay))
+                self.wakeup.set()
+
+
+class LocalStore(VocaStore):
+    """
+    로컬 저장소 공통 부분 (SQLiteStore / ParquetStore)
+    - 행마다 동기화 정보도 같이 저장: _synced(마지막 동기화 때 내용 해시), _dirty, _deleted
+    - 삭제는 시트에 반영될 때까지 _deleted 표시만 해 둠
+    - sync(remote) : 바뀐 행만 시트로 보내고, 시트에서 바뀐 행만 받아옴
+    하위 클래스는 _read_all / _read / _write_many / _remove_many 만 구현
+    """
+    META = {"_synced": "", "_dirty": 0, "_deleted": 0}
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.revision = 0
+        self.remote_modified = None
+
+    @staticmethod
+    def _fields(row):
+        return {col: (str(row.get(col)) if pd.notna(row.get(col)) else "") for col in VOCA_COLUMNS}
+
+    def modified_time(self):
+        return self.revision
+
+    def load(self):
+        with self.lock:
+            records = {row_id: r for row_id, r in self._read_all().items() if not r["_deleted"]}
+        df = pd.DataFrame(
+            [[r[col] for col in VOCA_COLUMNS] for r in records.values()],
+            columns=VOCA_COLUMNS,
+            index=pd.Index(list(records), name=ID_COLUMN)
+        )
+        return normalize_voca_frame(df.mask(df == ""))
+
+    def get(self, row_id):
+        with self.lock:
+            record = self._read(row_id)
+        if record is None or record["_deleted"]:
+            return None
+        return {col: record[col] for col in VOCA_COLUMNS}
+
+    def append_rows(self, rows):
+        with self.lock:
+            self._write_many({row_id: {**self._fields(row), **self.META, "_dirty": 1} for row_id, row in rows})
+
+    def update(self, row_id, fields):
+        self.write_many({row_id: fields}, [])
+
+    def delete(self, row_id):
+        self.write_many({}, [row_id])
+
+    def write_many(self, updates, deletes):
+        with self.lock:
+            records = {}
+            removed = []
+            for row_id, fields in updates.items():
+                record = self._read(row_id)
+                if record is None:
+                    raise KeyError(f"행을 찾을 수 없습니다: {row_id}")
+                record.update(self._fields({**record, **fields}))
+                record["_dirty"] = 1
+                records[row_id] = record
+            for row_id in deletes:
+                record = self._read(row_id)
+                if record is None:
+                    continue
+                if record["_synced"]:
+                    record["_deleted"] = 1
+                    record["_dirty"] = 1
+                    records[row_id] = record
+                else:
+                    # 시트에 올라간 적 없는 행은 바로 지움
+                    removed.append(row_id)
+            if records:
+                self._write_many(records)
+            if removed:
+                self._remove_many(removed)
+
+    def pending_writes(self):
+        with self.lock:
+            return sum(1 for record in self._read_all().values() if record["_dirty"])
+
+    @staticmethod
+    def _remote_modified_time(remote):
+        try:
+            return remote.modified_time()
+        except Exception:
+            return None
+
+    def sync(self, remote):
+        """
+        시트와 양방향 동기화 → (보낸 행 수, 받은 행 수)
+        - 로컬에서 바뀐 행(_dirty)만 시트에 추가/수정/삭제 (각각 배치 요청 1번)
+        - 시트 수정 시각이 그대로면 시트 전체를 다시 읽지 않음
+        - 양쪽에서 모두 바뀐 행은 로컬 값 우선
+        - 시트 요청 중에는 잠금을 풀어 둠 → 그동안의 읽기/저장은 기다리지 않음
+          (요청 뒤 잠금 안에서 로컬 행을 다시 읽어 그사이 바뀐 행은 _dirty 로 남김)
+        """
+        remote_modified = self._remote_modified_time(remote)
+        remote_rows = None
+        if remote_modified is None or remote_modified != self.remote_modified:
+            remote_df = remote.load()
+            remote_rows = {
+                row_id: self._fields(row)
+                for row_id, row in zip(remote_df.index, remote_df.to_dict("records"))
+            }
+
+        with self.lock:
+            local = self._read_all()
+            pulled = {}
+            removed = []
+            if remote_rows is not None:
+                for row_id, record in local.items():
+                    if record["_dirty"]:
+                        continue
+                    if row_id not in remote_rows:
+                        # 시트에서 지워진 행
+                        removed.append(row_id)
+                    elif row_hash(remote_rows[row_id]) != record["_synced"]:
+                        pulled[row_id] = remote_rows[row_id]
+                for row_id, fields in remote_rows.items():
+                    if row_id not in local:
+                        pulled[row_id] = fields
+
+            if pulled or removed:
+                if pulled:
+                    self._write_many({
+                        row_id: {**fields, **self.META, "_synced": row_hash(fields)}
+                        for row_id, fields in pulled.items()
+                    })
+                if removed:
+                    self._remove_many(removed)
+                self.revision += 1
+
+            new_rows, updates, deletes = [], {}, []
+            for row_id, record in local.items():
+                if not record["_dirty"]:
+                    continue
+                fields = {col: record[col] for col in VOCA_COLUMNS}
+                if record["_deleted"]:
+                    deletes.append(row_id)
+                elif record["_synced"] and (remote_rows is None or row_id in remote_rows):
+                    updates[row_id] = fields
+                else:
+                    new_rows.append((row_id, fields))
+
+        # 종류별로 보낸 직후 그 행들을 동기화됨으로 표시
+        # (뒤 단계가 실패해도 다음 동기화 때 이미 보낸 행을 또 추가하지 않음)
+        if new_rows:
+            remote.append_rows(new_rows)
+            self._settle(new_rows)
+        if updates:
+            remote.update_many(updates)
+            self._settle(updates.items())
+        if deletes:
+            remote.delete_many(deletes)
+            self._settle((row_id, None) for row_id in deletes)
+
+        # 내가 보낸 변경으로 바뀐 수정 시각은 다음 비교에서 빼기 위해 보낸 뒤 다시 확인
+        if new_rows or updates or deletes:
+            remote_modified = self._remote_modified_time(remote)
+        with self.lock:
+            self.remote_modified = remote_modified
+        return len(new_rows) + len(updates) + len(deletes), len(pulled) + len(removed)
+
+    def _settle(self, sent):
+        """
+        시트에 보낸 행 [(행 ID, 보낸 내용 / 삭제면 None), ...] 반영
+        - 보내는 사이 바뀌지 않았으면 동기화됨, 바뀌었으면 _dirty 그대로 두고 보낸 내용만 기록
+        - 보내는 사이 지워진 새 행은 시트에 남지 않도록 삭제 표시로 남김
+        """
+        with self.lock:
+            records = {}
+            removed = []
+            for row_id, fields in sent:
+                record = self._read(row_id)
+                if fields is None:
+                    if record is not None and record["_deleted"]:
+                        removed.append(row_id)
+                    continue
+                synced = row_hash(fields)
+                if record is None:
+                    records[row_id] = {**fields, **self.META, "_synced": synced, "_dirty": 1, "_deleted": 1}
+                elif not record["_deleted"] and row_hash(record) == synced:
+                    records[row_id] = {**record, **self.META, "_synced": synced}
+                else:
+                    records[row_id] = {**record, "_synced": synced}
+            if records:
+                self._write_many(records)
+            if removed:
+                self._remove_many(removed)
+
+
+class SQLiteStore(LocalStore):
+    """로컬 SQLite 단어장 (ID 기본키, 단어 중복 확인은 메모리의 DuplicateIndex 가 맡음)"""
+    def __init__(self, path):
+        super().__init__()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS voca ("
+            "ID TEXT PRIMARY KEY, 단어 TEXT, 뜻 TEXT, 예문 TEXT, 과목 TEXT, "
+            "_synced TEXT, _dirty INTEGER, _deleted INTEGER, _seq INTEGER)"
+        )
+        self.db.commit()
+        self.columns = VOCA_COLUMNS + list(self.META)
+        self.seq = self.db.execute("SELECT COALESCE(MAX(_seq), 0) FROM voca").fetchone()[0]
+
+    def _record(self, row):
+        return dict(zip(self.columns, row))
+
+    def _read_all(self):
+        # _seq: 처음 추가된 순서 (목록을 시트와 같은 순서로 유지)
+        rows = self.db.execute(f"SELECT ID, {', '.join(self.columns)} FROM voca ORDER BY _seq")
+        return {row[0]: self._record(row[1:]) for row in rows}
+
+    def _read(self, row_id):
+        row = self.db.execute(f"SELECT {', '.join(self.columns)} FROM voca WHERE ID = ?", (row_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def pending_writes(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM voca WHERE _dirty = 1").fetchone()[0]
+
+    def _write_many(self, records):
+        params = []
+        for row_id, record in records.items():
+            self.seq += 1
+            params.append((row_id, *[record[col] for col in self.columns], row_id, self.seq))
+        # 이미 있는 행은 원래 순서(_seq)를 유지
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO voca (ID, {', '.join(self.columns)}, _seq) VALUES "
+            f"(?, {', '.join('?' * len(self.columns))}, COALESCE((SELECT _seq FROM voca WHERE ID = ?), ?))",
+            params
+        )
+        self.db.commit()
+
+    def _remove_many(self, row_ids):
+        self.db.executemany("DELETE FROM voca WHERE ID = ?", [(row_id,) for row_id in row_ids])
+        self.db.commit()
+
+
+class ParquetStore(LocalStore):
+    """
+    로컬 Parquet 단어장
+    - 행 하나 쓸 때는 변경 기록(.changes.jsonl)에 한 줄만 추가
+    - 기록이 PARQUET_COMPACT_EVERY 줄 쌓이면 Parquet 파일을 새로 쓰고 기록을 비움
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.changes_path = path + ".changes.jsonl"
+        self.records = {}
+        if os.path.exists(path):
+            df = pd.read_parquet(path)
+            for record in df.to_dict("records"):
+                row_id = record.pop(ID_COLUMN)
+                self.records[row_id] = record
+        self.pending = 0
+        if os.path.exists(self.changes_path):
+            with open(self.changes_path, encoding="utf-8") as f:
+                for line in f:
+                    change = json.loads(line)
+                    if change["op"] == "put":
+                        self.records[change["id"]] = change["record"]
+                    else:
+                        self.records.pop(change["id"], None)
+                    self.pending += 1
+        # 아직 시트에 안 보낸 행 ID (화면마다 세지 않도록 쓸 때 갱신)
+        self.dirty = {row_id for row_id, record in self.records.items() if record["_dirty"]}
+
+    def _read_all(self):
+        return {row_id: dict(record) for row_id, record in self.records.items()}
+
+    def _read(self, row_id):
+        record = self.records.get(row_id)
+        return dict(record) if record is not None else None
+
+    def _log(self, changes):
+        with open(self.changes_path, "a", encoding="utf-8") as f:
+            for change in changes:
+                f.write(json.dumps(change, ensure_ascii=False) + "\n")
+        self.pending += len(changes)
+        if self.pending >= PARQUET_COMPACT_EVERY:
+            self.compact()
+
+    def pending_writes(self):
+        with self.lock:
+            return len(self.dirty)
+
+    def _write_many(self, records):
+        self.records.update(records)
+        for row_id, record in records.items():
+            if record["_dirty"]:
+                self.dirty.add(row_id)
+            else:
+                self.dirty.discard(row_id)
+        self._log([{"op": "put", "id": row_id, "record": record} for row_id, record in records.items()])
+
+    def _remove_many(self, row_ids):
+        for row_id in row_ids:
+            self.records.pop(row_id, None)
+            self.dirty.discard(row_id)
+        self._log([{"op": "remove", "id": row_id} for row_id in row_ids])
+
+    def compact(self):
+        with self.lock:
+            df = pd.DataFrame(
+                [{ID_COLUMN: row_id, **record} for row_id, record in self.records.items()],
+                columns=[ID_COLUMN] + VOCA_COLUMNS + list(self.META)
+            )
+            df.to_parquet(self.path + ".tmp", index=False)
+            os.replace(self.path + ".tmp", self.path)
+            open(self.changes_path, "w").close()
+            self.pending = 0
+
+
+@st.cache_resource
+def get_voca_store(worksheet_name):
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteStore(os.path.join(DATA_DIR, f"voca_{worksheet_name}.sqlite3"))
+    if STORAGE_BACKEND == "parquet":
+        return ParquetStore(os.path.join(DATA_DIR, f"voca_{worksheet_name}.parquet"))
+    return JournaledStore(get_sheet_store(worksheet_name), os.path.join(DATA_DIR, f"journal_{worksheet_name}.sqlite3"))
+
+
+class SyncWorker:
+    """
+    로컬 저장소 ↔ 구글 시트 주기적 동기화 (백그라운드 스레드 1개)
+    - connect() 로 시트에 연결 (실패하면 last_error 에 남기고 다음 동기화 때 다시 연결)
+    """
+    def __init__(self, local, connect, cache, interval):
+        self.local = local
+        self.connect = connect
+        self.remote = None
+        self.cache = cache
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last_sync = None
+        self.last_result = (0, 0)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sync_now()
+            except Exception:
+                pass
+
+    def sync_now(self):
+        with self.lock:
+            try:
+                if self.remote is None:
+                    self.remote = self.connect()
+                pushed, pulled = self.local.sync(self.remote)
+            except Exception as e:
+                # 화면의 "시트 반영 실패" 안내에 쓰임
+                self.local.last_error = e
+                raise
+            self.local.last_error = None
+            self.last_sync = self.local.last_flush = time.time()
+            self.last_result = (pushed, pulled)
+            if pulled:
+                # 시트에서 받아온 변경은 캐시를 다시 읽어서 반영
+                self.cache.invalidate()
+            return pushed, pulled
+
+
+@st.cache_resource
+def get_voca_cache(worksheet_name):
+    return VocaCache(get_voca_store(worksheet_name))
+
+
+@st.cache_resource
+def get_sync_worker(worksheet_name):
+    """로컬 저장소 + 시트 설정이 있을 때만 동기화 (없으면 오프라인으로 로컬만 사용)"""
+    store = get_voca_store(worksheet_name)
+    if not isinstance(store, LocalStore) or not has_sheet_config():
+        return None
+    # 연결 오류는 일시적일 수 있으므로 워커는 만들어 두고 동기화할 때마다 다시 연결 시도
+    worker = SyncWorker(store, lambda: get_sheet_store(worksheet_name), get_voca_cache(worksheet_name), SYNC_SECONDS)
+    try:
+        # 첫 동기화는 바로 (로컬이 비어 있으면 시트 내용을 받아옴)
+        worker.sync_now()
+    except Exception:
+        pass
+    return worker
+
+
+# 3-1. 복습 스케줄러 (SM-2)
+def end_of_today():
+    return datetime.datetime.combine(datetime.date.today(), datetime.time.max).timestamp()
+
+
+class ReviewScheduler:
+    """
+    SM-2 방식 간격 반복 스케줄러 (로컬 SQLite에 단어별 상태 + 복습 기록 저장)
+    - 아직 한 번도 안 푼 단어는 due = 0 (가장 먼저 나옴)
+    - 전체 / 과목별 힙(due 순)을 유지해서 가장 급한 N개를 O(N log n)에 꺼냄
+    - 힙에서 지우지 않고 값이 바뀌면 새 항목을 넣음 (꺼낼 때 최신 순번이 아니면 버림)
+    - 전체 / 과목별 정렬된 due 목록도 같이 유지 → 오늘 복습할 단어 수는 bisect 한 번
+    - 단어장 변경은 VocaCache.changes_since()로 바뀐 행만 반영
+    """
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS review_state ("
+            "row_id TEXT PRIMARY KEY, ease REAL, interval REAL, reps INTEGER, "
+            "lapses INTEGER, due REAL, last_review REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS review_log ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, row_id TEXT, reviewed_at REAL, "
+            "grade INTEGER, interval REAL, ease REAL)"
+        )
+        self.db.commit()
+        self.states = {
+            row[0]: {"ease": row[1], "interval": row[2], "reps": row[3], "lapses": row[4], "due": row[5]}
+            for row in self.db.execute(
+                "SELECT row_id, ease, interval, reps, lapses, due FROM review_state"
+            )
+        }
+        self.subject_of = {}
+        self.latest = {}    # 행 ID → 힙에 넣은 최신 항목 순번
+        self.heaps = {}
+        self.dues = {}      # 과목(None = 전체) → 정렬된 due 목록
+        self.indexed = {}   # 행 ID → dues 에 넣은 (due, 과목)
+        self.seq = 0
+        self.version = None
+
+    def due_of(self, row_id):
+        state = self.states.get(row_id)
+        return state["due"] if state else 0.0
+
+    def _unindex(self, row_id):
+        old = self.indexed.pop(row_id, None)
+        if old is None:
+            return
+        due, subject = old
+        for key in (None, subject):
+            dues = self.dues[key]
+            del dues[bisect.bisect_left(dues, due)]
+
+    def _push(self, row_id):
+        self.seq += 1
+        self.latest[row_id] = self.seq
+        due, subject = self.due_of(row_id), self.subject_of[row_id]
+        entry = (due, self.seq, row_id)
+        heapq.heappush(self.heaps.setdefault(None, []), entry)
+        heapq.heappush(self.heaps.setdefault(subject, []), entry)
+        self._unindex(row_id)
+        self.indexed[row_id] = (due, subject)
+        bisect.insort(self.dues.setdefault(None, []), due)
+        bisect.insort(self.dues.setdefault(subject, []), due)
+
+    def _rebuild(self, df):
+        self.subject_of = {
+            row_id: subject if pd.notna(subject) else "공통/기타"
+            for row_id, subject in zip(df.index, df["과목"])
+        }
+        self.heaps = {}
+        self.latest = {}
+        self.indexed = {}
+        entries = {}
+        for row_id, subject in self.subject_of.items():
+            self.seq += 1
+            self.latest[row_id] = self.seq
+            due = self.due_of(row_id)
+            entry = (due, self.seq, row_id)
+            entries.setdefault(None, []).append(entry)
+            entries.setdefault(subject, []).append(entry)
+            self.indexed[row_id] = (due, subject)
+        for key, heap in entries.items():
+            heapq.heapify(heap)
+            self.heaps[key] = heap
+        self.dues = {key: sorted(entry[0] for entry in heap) for key, heap in entries.items()}
+
+    def sync(self, cache):
+        # 데이터 / 버전 / 바뀐 행을 한 번에 읽어야 그 사이 추가된 행을 놓치지 않음
+        with cache.lock:
+            df, version = cache.data, cache.version
+            changed = cache.changes_since(self.version) if self.version is not None else None
+        with self.lock:
+            if self.version == version:
+                return
+            if changed is None:
+                self._rebuild(df)
+            else:
+                for row_id in changed:
+                    if row_id in df.index:
+                        subject = df.at[row_id, "과목"]
+                        self.subject_of[row_id] = subject if pd.notna(subject) else "공통/기타"
+                        self._push(row_id)
+                    else:
+                        self.subject_of.pop(row_id, None)
+                        self.latest.pop(row_id, None)
+                        self._unindex(row_id)
+                # 버려진 항목이 너무 많아지면 새로 만듦
+                if len(self.heaps.get(None, [])) > 2 * len(self.subject_of) + 100:
+                    self._rebuild(df)
+            self.version = version
+
+    def _valid(self, entry):
+        return self.latest.get(entry[2]) == entry[1]
+
+    def most_due(self, n, subject=None, due_before=None):
+        """due가 가장 이른 단어 n개 (due_before 가 있으면 그 시각까지 복습할 단어만)"""
+        with self.lock:
+            heap = self.heaps.get(subject, [])
+            picked = []
+            while heap and len(picked) < n:
+                entry = heapq.heappop(heap)
+                if not self._valid(entry):
+                    continue
+                if due_before is not None and entry[0] > due_before:
+                    heapq.heappush(heap, entry)
+                    break
+                picked.append(entry)
+            for entry in picked:
+                heapq.heappush(heap, entry)
+            return [entry[2] for entry in picked]
+
+    def due_count(self, subject=None, due_before=None):
+        """due_before 까지 복습할 단어 수 (힙을 꺼내지 않고 정렬된 due 목록에서 bisect)"""
+        with self.lock:
+            dues = self.dues.get(subject, [])
+            return len(dues) if due_before is None else bisect.bisect_right(dues, due_before)
+
+    def record(self, row_id, correct):
+        """답 기록 + SM-2 갱신 (맞음 = 4점, 틀림 = 1점)"""
+        grade = 4 if correct else 1
+        now = time.time()
+        with self.lock:
+            state = self.states.get(row_id) or {"ease": 2.5, "interval": 0.0, "reps": 0, "lapses": 0, "due": 0.0}
+            if grade < 3:
+                state["reps"] = 0
+                state["lapses"] += 1
+                state["interval"] = 1.0
+            else:
+                state["reps"] += 1
+                if state["reps"] == 1:
+                    state["interval"] = 1.0
+                elif state["reps"] == 2:
+                    state["interval"] = 6.0
+                else:
+                    state["interval"] = round(state["interval"] * state["ease"])
+            state["ease"] = max(1.3, state["ease"] + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+            state["due"] = now + state["interval"] * 86400
+            self.states[row_id] = state
+
+            self.db.execute(
+                "INSERT OR REPLACE INTO review_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (row_id, state["ease"], state["interval"], state["reps"], state["lapses"], state["due"], now)
+            )
+            self.db.execute(
+                "INSERT INTO review_log (row_id, reviewed_at, grade, interval, ease) VALUES (?, ?, ?, ?, ?)",
+                (row_id, now, grade, state["interval"], state["ease"])
+            )
+            self.db.commit()
+            if row_id in self.subject_of:
+                self._push(row_id)
+
+
+@st.cache_resource
+def get_review_scheduler(worksheet_name):
+    # 공용 단어장은 예전 파일 이름 그대로
+    suffix = "" if worksheet_name == WORKSHEET_NAME else f"_{worksheet_name}"
+    return ReviewScheduler(os.path.join(DATA_DIR, f"reviews{suffix}.sqlite3"))
+
+
+# 3-2. 내보내기 (CSV / Parquet / Anki)
+EXPORT_CHUNK_ROWS = 5000  # 파일에 한 번에 쓰는 행 수
+EXPORT_FORMATS = {
+    # 형식: (확장자, MIME)
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "anki": ("txt", "text/plain"),
+}
+
+
+def anki_field(value):
+    """Anki 가져오기용 필드: HTML 이스케이프, 줄바꿈은 <br>, 탭은 공백"""
+    return html.escape(text_of(value)).replace("\t", " ").replace("\n", "<br>")
+
+
+def anki_tag(subject):
+    """과목 → Anki 태그 (공백/슬래시는 태그 구분자라서 _ 로)"""
+    return re.sub(r"[\s/]+", "_", text_of(subject).strip())
+
+
+def write_export(data, fmt, path):
+    """data 를 EXPORT_CHUNK_ROWS 행씩 나눠서 path 에 기록 (전체를 한 문자열로 만들지 않음)"""
+    data = data[VOCA_COLUMNS]
+    chunks = (data.iloc[k:k + EXPORT_CHUNK_ROWS] for k in range(0, len(data), EXPORT_CHUNK_ROWS))
+
+    if fmt == "csv":
+        # 엑셀에서 한글이 깨지지 않도록 BOM 포함
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            data.iloc[:0].to_csv(f, index=False)
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=False)
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(col, pa.string()) for col in VOCA_COLUMNS])
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    elif fmt == "anki":
+        # Anki [파일 → 가져오기]용 텍스트: 앞면 = 단어, 뒷면 = 뜻 + 예문, 태그 = 과목
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("#separator:tab\n#html:true\n#tags column:3\n")
+            for chunk in chunks:
+                f.writelines(
+                    f"{anki_field(word)}\t{anki_field(meaning)}<br><br>{anki_field(example)}\t{anki_tag(subject)}\n"
+                    for word, meaning, example, subject in chunk.itertuples(index=False)
+                )
+    else:
+        raise ValueError(f"알 수 없는 내보내기 형식: {fmt}")
+
+
+class ExportCache:
+    """
+    내보내기 파일 캐시 (단어장마다 1개, 모든 세션이 공유)
+    - 다운로드 버튼을 누를 때만 만들어짐 (버튼이 다른 스레드에서 호출)
+    - (형식, 과목) 별로 데이터 버전마다 한 번만 만들고 파일로 보관
+    - 더 새로운 버전이 들어오면 이전 파일은 지움
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # 이전 실행에서 남은 파일 정리
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        self.lock = threading.Lock()
+        self.version = None
+        self.paths = {}
+
+    def _new_path(self, fmt):
+        return os.path.join(self.directory, f"{uuid.uuid4().hex[:12]}.{EXPORT_FORMATS[fmt][0]}")
+
+    @staticmethod
+    def _write(data, fmt, path):
+        # 다운로드 버튼이 스크립트 실행 밖에서 부르므로 span 대신 성능 로그로 남김
+        started = time.perf_counter()
+        write_export(data, fmt, path)
+        if profile_log.isEnabledFor(logging.INFO):
+            profile_log.info(json.dumps({
+                "span": "export.write", "format": fmt, "rows": len(data),
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+            }))
+
+    def get(self, data, version, fmt, subject=None):
+        """
+        data(버전 version)를 fmt 형식으로 → 파일 내용(bytes)
+        - 조각 단위로 나누는 것은 파일을 만들 때뿐 (write_export)
+          st.download_button 은 내용 전체를 bytes 로 받으므로 돌려줄 때는 한 번에 읽음
+        """
+        if subject is not None:
+            data = data[data["과목"] == subject]
+        with self.lock:
+            if self.version is None or version > self.version:
+                for path in self.paths.values():
+                    os.remove(path)
+                self.paths = {}
+                self.version = version
+            if version == self.version:
+                key = (fmt, subject)
+                if key not in self.paths:
+                    path = self._new_path(fmt)
+                    self._write(data, fmt, path)
+                    self.paths[key] = path
+                with open(self.paths[key], "rb") as f:
+                    return f.read()
+
+        # 예전 버전을 보고 있는 세션 → 캐시하지 않고 한 번만 만듦
+        path = self._new_path(fmt)
+        try:
+            self._write(data, fmt, path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+@st.cache_resource
+def get_export_cache(worksheet_name):
+    return ExportCache(os.path.join(DATA_DIR, f"exports_{worksheet_name}"))
+
+
+def export_button(label, data, version, fmt, subject, file_name):
+    """누를 때만 파일을 만드는 다운로드 버튼 (과목을 고른 경우 그 과목만)"""
+    export_cache = get_export_cache(voca_worksheet)
+    ext, mime = EXPORT_FORMATS[fmt]
+    st.download_button(
+        label=label,
+        data=lambda: export_cache.get(data, version, fmt, subject),
+        file_name=f"{file_name}{'_' + subject.replace('/', '_') if subject else ''}.{ext}",
+        mime=mime,
+        use_container_width=True,
+        key=f"export_{fmt}",
+    )
+
+
+# 3-3. 자막/강의록에서 단어 뽑기
+EXTRACT_CHUNK_BYTES = 1 << 20  # 업로드 파일을 읽는 단위 (1MB)
+EXTRACT_MAX_KEYS = 200000  # 세는 단어 종류 상한 → 넘으면 적게 나온 단어부터 버림 (메모리 제한)
+EXTRACT_MIN_LEN = 3  # 이보다 짧은 단어는 제외
+EXTRACT_TOKEN = re.compile(r"[A-Za-z]+(?:['’-][A-Za-z]+)*")
+SUBTITLE_NOISE = re.compile(r"<[^>]*>|\{[^}]*\}|\[[^\]]*\]")  # <i>, {\an8}, [음악]
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further get got had has
+have having he her here hers herself him himself his how i if in into is it its itself just let like
+me more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they this
+those through to too under until up upon very was we were what when where which while who whom why
+will with would you your yours yourself yourselves one two three yes yeah okay hey uh um oh ah gonna
+wanna gotta really well right know think going come came say said see look want thing things
+don won isn aren didn doesn wasn weren couldn wouldn shouldn haven hasn hadn ain
+""".split())
+
+
+def iter_text_chunks(file, chunk_bytes=EXTRACT_CHUNK_BYTES):
+    """
+    업로드 파일을 chunk_bytes 씩 읽어서 (텍스트, 지금까지 읽은 바이트) 로 돌려줌
+    - 줄 중간에서 끊기지 않도록 마지막 줄은 다음 조각으로 넘김
+    - UTF-8 (BOM 포함) 로 읽고, 깨진 글자는 대체 문자로
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    read = 0
+    while True:
+        data = file.read(chunk_bytes)
+        read += len(data)
+        text = pending + decoder.decode(data, final=not data)
+        if data:
+            cut = text.rfind("\n") + 1
+            text, pending = text[:cut], text[cut:]
+        yield text, read
+        if not data:
+            return
+
+
+def subtitle_lines(text):
+    """.srt / .vtt 에서 번호·시간 줄과 태그를 뺀 대사만"""
+    return "\n".join(
+        SUBTITLE_NOISE.sub(" ", line) for line in text.splitlines()
+        if line.strip() and not line.strip().isdigit() and "-->" not in line and line.strip() != "WEBVTT"
+    )
+
+
+class WordExtractor:
+    """
+    큰 텍스트/자막을 조각 단위로 받아 단어 빈도를 세는 추출기
+    - feed(text) : 조각 하나 처리 (조각 안은 Counter로 한 번에 센 뒤 정규화 키(word_key)로 합침)
+    - 불용어, 짧은 단어, 항상 대문자로 시작한 단어(사람/지명 등)는 후보에서 제외
+    - 단어 종류가 EXTRACT_MAX_KEYS 를 넘으면 적게 나온 단어부터 버려서 메모리를 일정하게 유지
+    - candidates(known, ...) : 키나 나온 표기 중 하나라도 known(단어)가 참이면 (이미 단어장에 있음) 빼고 많이 나온 순
+      (어간만 같은 단어는 다른 단어일 수 있으므로 아는 단어로 치지 않음: 단어장의 unit ≠ 자막의 united)
+    """
+
+    def __init__(self, subtitle=False):
+        self.subtitle = subtitle
+        self.counts = Counter()  # 키 → 횟수
+        self.forms = {}          # 키 → {표기: 횟수}
+        self.lower = set()       # 소문자로 나온 적 있는 키
+        self.key_of = {}         # 표기 → 키 (word_key 계산 캐시)
+        self.tokens = 0
+        self.pruned = 0          # 메모리 제한 때문에 버린 최소 횟수
+
+    def feed(self, text):
+        if self.subtitle:
+            text = subtitle_lines(text)
+        for token, n in Counter(EXTRACT_TOKEN.findall(text)).items():
+            self.tokens += n
+            word = token.lower().replace("’", "'").split("'")[0]
+            if len(word) < EXTRACT_MIN_LEN or word in STOPWORDS:
+                continue
+            key = self.key_of.get(word)
+            if key is None:
+                key = self.key_of[word] = word_key(word)
+            self.counts[key] += n
+            forms = self.forms.setdefault(key, {})
+            forms[word] = forms.get(word, 0) + n
+            if token[0].islower():
+                self.lower.add(key)
+        if len(self.counts) > EXTRACT_MAX_KEYS:
+            self._prune()
+
+    def _prune(self):
+        # 절반 아래로 줄 때까지 적게 나온 단어부터 버림
+        while len(self.counts) > EXTRACT_MAX_KEYS // 2:
+            self.pruned += 1
+            for key in [k for k, n in self.counts.items() if n <= self.pruned]:
+                del self.counts[key]
+                del self.forms[key]
+                self.lower.discard(key)
+        if len(self.key_of) > EXTRACT_MAX_KEYS * 2:
+            self.key_of = {}
+
+    def candidates(self, known, min_count=2, limit=200):
+        """[{"단어", "횟수"}, ...] (많이 나온 순, 같으면 긴 단어 먼저)"""
+        ranked = sorted(
+            (
+                key for key, n in self.counts.items()
+                if n >= min_count and key in self.lower
+                and not known(key) and not any(known(form) for form in self.forms[key])
+            ),
+            key=lambda key: (-self.counts[key], -len(key))
+        )
+        result = []
+        for key in ranked[:limit]:
+            forms = self.forms[key]
+            result.append({"단어": min(forms, key=lambda form: (-forms[form], len(form))), "횟수": self.counts[key]})
+        return result
+
+
+# 3-4. 뜻 단위 표 (뜻 하나 = 1행)
+SENSE_NUMBER_PATTERN = r"^\s*\d+[\.\)]\s*"  # 줄 앞의 "1. " / "2) "
+SENSE_POS_PATTERN = r"^\[([^\]]+)\]\s*"     # 뜻 앞의 [명사] / [동사] …
+SENSE_COLUMNS = [ID_COLUMN, "번호", "단어", "품사", "뜻", "예문", "과목"]
+
+
+def _sense_lines(column):
+    """여러 줄 칸 → (행 ID, 번호, 내용) 표 (번호는 칸 안에서 빈 줄을 뺀 순서)"""
+    lines = column.dropna().astype(str).str.split("\n").explode().str.strip()
+    lines = lines[lines.notna() & (lines != "")]
+    frame = pd.DataFrame({
+        ID_COLUMN: lines.index.to_numpy(),
+        "내용": lines.str.replace(SENSE_NUMBER_PATTERN, "", regex=True).to_numpy(),
+    })
+    frame["번호"] = frame.groupby(ID_COLUMN).cumcount().astype("int16") + 1
+    return frame
+
+
+def build_sense_table(df):
+    """
+    단어장 → 뜻 단위 표 [행 ID, 번호, 단어, 품사, 뜻, 예문, 과목] (문자열 처리는 전부 열 단위로 한 번에)
+    - 뜻/예문의 n번째 줄끼리 짝 (AI 분석 결과 형식), 예문이 모자라면 빈 칸
+    - 품사/과목(행 ID 포함)은 category → 품사별·과목별 조회가 열 비교 한 번
+    """
+    meanings = _sense_lines(df["뜻"])
+    examples = _sense_lines(df["예문"]).rename(columns={"내용": "예문"})
+    senses = meanings.merge(examples, on=[ID_COLUMN, "번호"], how="left")
+    senses["품사"] = senses["내용"].str.extract(SENSE_POS_PATTERN, expand=False).fillna("")
+    senses["뜻"] = senses["내용"].str.replace(SENSE_POS_PATTERN, "", regex=True)
+    senses["예문"] = senses["예문"].fillna("")
+    rows = df.reindex(senses[ID_COLUMN])
+    senses["단어"] = rows["단어"].fillna("").astype(str).str.strip().to_numpy()
+    senses["과목"] = rows["과목"].fillna("").astype(str).to_numpy()
+    return categorize_senses(senses[SENSE_COLUMNS])
+
+
+def categorize_senses(senses):
+    for col in (ID_COLUMN, "품사", "과목"):
+        senses[col] = senses[col].astype("category")
+    return senses
+
+
+class SenseTable:
+    """
+    뜻 단위 표 (단어장마다 1개, 모든 세션이 공유)
+    - sync(cache) : 단어장 캐시의 바뀐 행만 다시 만들어서 끼워 넣음 (기록이 없으면 전체 다시)
+    - 결과 (표, 데이터 버전) → 세션들은 읽기 전용으로 사용
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.table = None
+
+    def sync(self, cache):
+        with cache.lock:
+            data, version = cache.data, cache.version
+            changed = cache.changes_since(self.version) if self.version is not None else None
+        with self.lock:
+            if version == self.version:
+                return self.table, version
+            if changed is None:
+                table = build_sense_table(data)
+            else:
+                changed = set(changed)
+                kept = self.table[~self.table[ID_COLUMN].isin(changed)]
+                fresh = build_sense_table(data.loc[[row_id for row_id in changed if row_id in data.index]])
+                # category 값 목록을 맞춰야 합쳐도 category 로 남음
+                for col in (ID_COLUMN, "품사", "과목"):
+                    categories = kept[col].cat.categories.union(fresh[col].cat.categories)
+                    kept = kept.assign(**{col: kept[col].cat.set_categories(categories)})
+                    fresh[col] = fresh[col].cat.set_categories(categories)
+                table = pd.concat([kept, fresh], ignore_index=True)
+            self.table, self.version = table, version
+            return table, version
+
+
+@st.cache_resource
+def get_sense_table(worksheet_name):
+    return SenseTable()
+
+
+# 3-5. 객관식 퀴즈 오답 인덱스
+MC_OPTIONS = 4  # 객관식 보기 수 (정답 포함)
+
+
+def meaning_summary(meaning):
+    """뜻의 첫 줄 (번호 빼고) → 객관식 보기용"""
+    if pd.isna(meaning) or not str(meaning).strip():
+        return ""
+    return re.sub(r"^\s*\d+\.\s*", "", str(meaning).strip().splitlines()[0])
+
+
+class DistractorIndex:
+    """
+    객관식 오답 보기 인덱스 (단어장마다 1개, 데이터 버전마다 한 번만 만듦)
+    - 첫 번째 뜻의 품사와 과목(뜻 단위 표)으로 묶은 행 ID 배열: (과목, 품사) / (None, 품사) / (None, None)=전체
+    - 오답은 같은 과목·품사 → 같은 품사 → 전체 순으로 채움
+    - 뽑을 때는 배열에서 난수 위치 몇 개만 읽음 → 단어 수와 상관없이 문제 하나 만드는 시간이 일정
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.groups = {}
+        self.group_of = {}  # 행 ID → (과목, 품사)
+        self.rng = np.random.default_rng()
+
+    def sync(self, senses, version):
+        """뜻 단위 표(senses, 데이터 버전 version)가 바뀌었으면 다시 만듦"""
+        with self.lock:
+            if version != self.version:
+                self.build(senses)
+                self.version = version
+
+    def build(self, senses):
+        first = senses[senses["번호"] == 1]
+        ids = first[ID_COLUMN].to_numpy(dtype=object)
+        self.groups = {(None, None): ids}
+        for (subj, tag), positions in first.groupby(["과목", "품사"], observed=True).indices.items():
+            self.groups[(subj, tag)] = ids[positions]
+        for tag, positions in first.groupby("품사", observed=True).indices.items():
+            self.groups[(None, tag)] = ids[positions]
+        self.group_of = dict(zip(ids, zip(first["과목"].astype(str), first["품사"].astype(str))))
+
+    def sample(self, row_id, k, label):
+        """
+        row_id 문제의 오답 k개 → [행 ID, ...]
+        - label(행 ID) 이 정답이나 다른 보기와 같은 행은 건너뜀 (같은 뜻/단어가 두 번 나오지 않게)
+        """
+        subject, pos = self.group_of.get(row_id, (None, None))
+        seen = {label(row_id)}
+        chosen = []
+        with self.lock:
+            for key in ((subject, pos), (None, pos), (None, None)):
+                pool = self.groups.get(key)
+                if pool is None or len(pool) <= 1:
+                    continue
+                for other in pool[self.rng.integers(0, len(pool), size=(k - len(chosen)) * 4 + 4)]:
+                    if other == row_id:
+                        continue
+                    text = label(other)
+                    if not text or text in seen:
+                        continue
+                    seen.add(text)
+                    chosen.append(other)
+                    if len(chosen) == k:
+                        return chosen
+        return chosen
+
+
+@st.cache_resource
+def get_distractor_index(worksheet_name):
+    return DistractorIndex()
+
+
+# 3-6. 학습 통계 (누적 집계)
+STATS_TREND_DAYS = 30      # 대시보드 추이 그래프 기간 (일)
+STATS_WEAK_MIN_SEEN = 3    # 약한 단어로 보려면 최소 N번은 풀었어야 함
+STATS_WEAK_WORDS = 10      # 약한 단어 표시 개수
+STATS_TABLES = {"word_stats": "row_id", "subject_stats": "subject", "daily_stats": "day"}  # 테이블: 키 열
+
+
+class StudyStats:
+    """
+    학습 통계 (로컬 SQLite, 단어장마다 1개)
+    - 단어별 / 과목별 / 날짜별로 (푼 수, 맞힌 수) 누적값만 저장 → 답 1개마다 O(1) 갱신
+      (원본 기록을 다시 훑지 않으므로 기록이 쌓여도 대시보드 속도는 그대로)
+    - 과목은 답한 시점의 과목으로 집계 (나중에 과목을 바꿔도 지난 기록은 안 옮김)
+    - 단어장의 과목 목록 / 과목별 단어 수도 같이 유지 (VocaCache.changes_since()로 바뀐 행만 반영)
+    """
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        for table, key in STATS_TABLES.items():
+            self.db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"{key} TEXT PRIMARY KEY, seen INTEGER NOT NULL, correct INTEGER NOT NULL)"
+            )
+        self.db.commit()
+        # 테이블 → {키: [푼 수, 맞힌 수]}
+        self.totals = {
+            table: {row[0]: [row[1], row[2]] for row in self.db.execute(f"SELECT * FROM {table}")}
+            for table in STATS_TABLES
+        }
+        # 전체 합계도 따로 들고 있음 (날짜별 값을 매번 더하지 않도록)
+        self.total_seen = sum(seen for seen, _ in self.totals["daily_stats"].values())
+        self.total_correct = sum(correct for _, correct in self.totals["daily_stats"].values())
+        self.subject_of = {}         # 행 ID → 과목 (없으면 None)
+        self.subject_counts = Counter()
+        self.subject_list = None     # 정렬한 과목 목록 (과목이 생기거나 없어질 때만 다시 만듦)
+        self.version = None
+
+    # ---------- 단어장 과목 목록 / 개수 ----------
+    def _set_subject(self, row_id, subject):
+        old = self.subject_of.get(row_id)
+        if old is not None:
+            self.subject_counts[old] -= 1
+            if not self.subject_counts[old]:
+                del self.subject_counts[old]
+                self.subject_list = None
+        if subject is None:
+            self.subject_of.pop(row_id, None)
+            return
+        self.subject_of[row_id] = subject
+        if not self.subject_counts[subject]:
+            self.subject_list = None
+        self.subject_counts[subject] += 1
+
+    def sync(self, cache):
+        with cache.lock:
+            df, version = cache.data, cache.version
+            changed = cache.changes_since(self.version) if self.version is not None else None
+        with self.lock:
+            if self.version == version:
+                return
+            if changed is None:
+                has_subject = df["과목"].notna() & (df["과목"] != "")
+                self.subject_of = dict(zip(df.index[has_subject], df.loc[has_subject, "과목"]))
+                self.subject_counts = Counter(self.subject_of.values())
+                self.subject_list = None
+            else:
+                for row_id in changed:
+                    subject = df.at[row_id, "과목"] if row_id in df.index else None
+                    self._set_subject(row_id, subject if pd.notna(subject) and subject else None)
+            self.version = version
+
+    def subjects(self):
+        """단어장에 있는 과목 (정렬)"""
+        with self.lock:
+            if self.subject_list is None:
+                self.subject_list = sorted(self.subject_counts)
+            return self.subject_list
+
+    def subject_count(self, subject):
+        with self.lock:
+            return self.subject_counts.get(subject, 0)
+
+    # ---------- 답 기록 ----------
+    def record(self, row_id, correct, when=None):
+        """답 1개 → 단어 / 과목 / 날짜 누적값을 1씩 올림"""
+        day = (when or datetime.date.today()).isoformat()
+        hit = 1 if correct else 0
+        with self.lock:
+            subject = self.subject_of.get(row_id) or "공통/기타"
+            self.total_seen += 1
+            self.total_correct += hit
+            for table, key in (("word_stats", row_id), ("subject_stats", subject), ("daily_stats", day)):
+                total = self.totals[table].setdefault(key, [0, 0])
+                total[0] += 1
+                total[1] += hit
+                self.db.execute(
+                    f"INSERT INTO {table} VALUES (?, 1, ?) "
+                    f"ON CONFLICT({STATS_TABLES[table]}) DO UPDATE SET seen = seen + 1, correct = correct + excluded.correct",
+                    (key, hit)
+                )
+            self.db.commit()
+
+    def word(self, row_id):
+        """단어 하나의 (푼 수, 맞힌 수)"""
+        with self.lock:
+            return tuple(self.totals["word_stats"].get(row_id, (0, 0)))
+
+    def daily(self, days, today=None):
+        """최근 days일의 날짜별 (날짜, 푼 수, 맞힌 수) — 기록 길이와 상관없이 days번만 찾아봄"""
+        today = today or datetime.date.today()
+        with self.lock:
+            totals = self.totals["daily_stats"]
+            rows = []
+            for offset in range(days - 1, -1, -1):
+                day = today - datetime.timedelta(days=offset)
+                seen, correct = totals.get(day.isoformat(), (0, 0))
+                rows.append((day, seen, correct))
+            return rows
+
+    def by_subject(self):
+        """과목별 (단어 수, 푼 수, 맞힌 수)"""
+        with self.lock:
+            totals = self.totals["subject_stats"]
+            return {
+                subject: (self.subject_counts.get(subject, 0), *totals.get(subject, (0, 0)))
+                for subject in sorted(set(self.subject_counts) | set(totals))
+            }
+
+    def overall(self):
+        """전체 (푼 수, 맞힌 수, 한 번이라도 푼 단어 수)"""
+        with self.lock:
+            return self.total_seen, self.total_correct, len(self.totals["word_stats"])
+
+    def weakest(self, n, exists, min_seen=STATS_WEAK_MIN_SEEN):
+        """정답률이 가장 낮은 단어 n개 [(행 ID, 푼 수, 맞힌 수)] (exists(행 ID)가 거짓인 단어는 뺌)"""
+        with self.lock:
+            items = [
+                (row_id, seen, correct)
+                for row_id, (seen, correct) in self.totals["word_stats"].items()
+                if seen >= min_seen and exists(row_id)
+            ]
+        return heapq.nsmallest(n, items, key=lambda item: (item[2] / item[1], -item[1]))
+
+
+@st.cache_resource
+def get_study_stats(worksheet_name):
+    # 공용 단어장은 접미사 없이 (복습 기록 파일과 같은 규칙)
+    suffix = "" if worksheet_name == WORKSHEET_NAME else f"_{worksheet_name}"
+    return StudyStats(os.path.join(DATA_DIR, f"stats{suffix}.sqlite3"))
+
+
+# 사용자별 단어장: 사이드바 이름 (주소 뒤 ?user=이름 으로 바로 열 수도 있음)
+# 저장소/캐시/스케줄러는 워크시트 이름별로 프로세스에 1개씩 → 같은 이름의 세션끼리 공유
+USER_STATE_PREFIXES = ("qz_", "editing_", "bulk_", "analyzed_", "word_page", "dup_")
+
+
+def on_user_change():
+    # 다른 사람 단어장의 퀴즈/편집/분석 상태가 넘어가지 않도록 정리
+    for key in list(st.session_state):
+        if isinstance(key, str) and key.startswith(USER_STATE_PREFIXES):
+            del st.session_state[key]
+    user = st.session_state["user_name"].strip()
+    if USER_NAME_PATTERN.match(user):
+        st.query_params["user"] = user
+    else:
+        st.query_params.pop("user", None)
+
+
+if "user_name" not in st.session_state:
+    st.session_state["user_name"] = st.query_params.get("user", "")
+voca_user = st.sidebar.text_input(
+    "👤 사용자 이름", key="user_name", on_change=on_user_change,
+    placeholder="비우면 공용 단어장", help="이름마다 단어장(워크시트)이 따로 만들어집니다."
+).strip()
+if voca_user and not USER_NAME_PATTERN.match(voca_user):
+    st.sidebar.error("이름은 한글/영문/숫자/_/- 로 30자까지 쓸 수 있습니다. 공용 단어장을 엽니다.")
+    voca_user = ""
+voca_worksheet = worksheet_for_user(voca_user)
+st.sidebar.caption(f"📒 단어장: {voca_user or '공용'} (`{voca_worksheet}`)")
+
+try:
+    with span("storage.connect"):
+        voca_store = get_voca_store(voca_worksheet)
+        voca_cache = get_voca_cache(voca_worksheet)
+        sync_worker = get_sync_worker(voca_worksheet)
+    with span("storage.read"), voca_cache.lock:
+        existing_data = voca_cache.get()
+        data_version = voca_cache.version
+    voca_dupes = voca_cache.dupes
+    with span("storage.senses"):
+        voca_senses, senses_version = get_sense_table(voca_worksheet).sync(voca_cache)
+    # 과목 목록 / 과목별 단어 수 + 퀴즈 누적 통계 (바뀐 행만 반영)
+    study_stats = get_study_stats(voca_worksheet)
+    with span("stats.sync"):
+        study_stats.sync(voca_cache)
+except Exception as e:
+    st.error(f"구글 시트 연결 오류: {e}")
+    st.caption("연결될 때까지 단어 추가/수정은 꺼 둡니다. 목록 위의 '🔄 다시 연결'로 다시 시도할 수 있습니다.")
+    voca_store = voca_cache = sync_worker = None
+    existing_data = pd.DataFrame(columns=VOCA_COLUMNS, index=pd.Index([], name=ID_COLUMN))
+    data_version = 0
+    voca_dupes = DuplicateIndex()
+    voca_senses, senses_version = build_sense_table(existing_data), 0
+    study_stats = StudyStats(":memory:")
+
+# 전공 과목 리스트 
+SUBJECTS = [
+    "공통/기타",
+    "영문법의 기초", 
+    "영문법의 활용", 
+    "영어교수법", 
+    "테스트영어연습", 
+    "영어회화1", 
+    "영화로 생각하기", 
+    "영작문2"
+]
+
+# 단어장 목록 페이지 크기
+WORD_PAGE_SIZES = [10, 20, 50, 100]
+DEFAULT_WORD_PAGE_SIZE = 20
+
+# 탭 구성
+tab1, tab2, tab3, tab4 = st.tabs(["📚 단어장 관리", "🧰 영어 공부 도구함", "🎯 퀴즈 모드", "📊 학습 통계"])
+
+# ==========================================
+# 탭 1: 단어장
+# ==========================================
+with tab1:
+    with st.expander("🔍 단어/숙어 분석 및 추가", expanded=True):
+        with st.form("search_form", clear_on_submit=True):
+            col_input, col_btn = st.columns([4, 1])
+            with col_input:
+                word_input = st.text_input("단어 또는 숙어 입력", placeholder="예: address")
+            with col_btn:
+                search_submitted = st.form_submit_button("🔍 분석")
+
+            if search_submitted and word_input:
+                input_word = word_input.strip()
+                
+                if not GEMINI_API_KEY:
+                    st.error("AI 모델 연결 실패")
+                else:
+                    # 스트리밍으로 받으면서 교정된 단어 / 뜻·예문 줄이 완성되는 대로 미리 보여줌
+                    preview = st.empty()
+                    stream_parser = AnalysisParser(input_word)
+
+                    def show_chunk(text):
+                        before = (stream_parser.final_word, len(stream_parser.meanings))
+                        stream_parser.feed(text)
+                        if (stream_parser.final_word, len(stream_parser.meanings)) == before:
+                            return
+                        word, meaning, example = stream_parser.result()
+                        with preview.container():
+                            st.info(f"🧐 **{word}** 분석 중...")
+                            p1, p2 = st.columns(2)
+                            p1.text_area("🇰🇷 뜻 (받는 중...)", value=meaning, height=150, disabled=True)
+                            p2.text_area("🇺🇸 예문 (받는 중...)", value=example, height=150, disabled=True)
+
+                    with st.spinner(f"AI가 '{input_word}'를 분석 중..."):
+                        try:
+                            with span("gemini.analyze"):
+                                st.session_state['analyzed_result'] = analyze_word(input_word, on_chunk=show_chunk)
+                            st.session_state['analyzed_word'] = input_word 
+                        except GeminiUnavailable as e:
+                            st.warning(f"⏳ {e}")
+                        except Exception as e:
+                            st.error(f"오류 발생: {describe_gemini_error(e)}")
+                    preview.empty()
+
+        cache_stats = get_analysis_cache().stats()
+        st.caption(
+            f"⚡ 분석 캐시: {cache_stats['size']}개 저장 · "
+            f"적중 {cache_stats['hits']} · 미스 {cache_stats['misses']} · 동시요청 공유 {cache_stats['shared']}"
+        )
+        if GEMINI_API_KEY:
+            gemini_client = get_gemini_client(GEMINI_API_KEY)
+            ai_stats = gemini_client.stats()
+            if ai_stats["breaker_wait"] is not None:
+                st.caption(f"🔌 AI 오류가 이어져 호출을 잠시 멈춤 ({math.ceil(ai_stats['breaker_wait'])}초 뒤 다시 시도)")
+            if ai_stats["successes"]:
+                # 단어 1개(성공한 호출 1번)당 평균 토큰 → 프롬프트 줄이기 / 비용 추정용
+                p50 = gemini_client.latency_quantile(0.5)
+                p95 = gemini_client.latency_quantile(0.95)
+                st.caption(
+                    f"🤖 AI 호출 {ai_stats['calls']}회 (재시도 {ai_stats['retries']} · 실패 {ai_stats['errors']} · "
+                    f"차단 {ai_stats['rejected']}) · 단어당 토큰 입력 "
+                    f"{ai_stats['prompt_tokens'] / ai_stats['successes']:.0f} / 출력 "
+                    f"{ai_stats['response_tokens'] / ai_stats['successes']:.0f} · "
+                    f"지연 평균 {ai_stats['latency_avg']:.1f}초 · p50 {latency_label(p50)} · p95 {latency_label(p95)}"
+                )
+
+    # 분석 결과 확인
+    if 'analyzed_result' in st.session_state and 'analyzed_word' in st.session_state:
+        final_word, default_meaning, default_example = parse_analysis(
+            st.session_state['analyzed_result'],
+            st.session_state.get('analyzed_word', 'Unknown')
+        )
+        st.session_state['analyzed_word'] = final_word
+
+        similar_words = sorted(set(voca_dupes.find(final_word).values()))
+        if voca_dupes.has_exact(final_word):
+            st.warning(f"⚠️ '{final_word}'는 이미 단어장에 있습니다!")
+        elif similar_words:
+            st.warning(f"⚠️ 비슷한 단어가 이미 있습니다: {', '.join(similar_words)}")
+        else:
+            st.info(f"🧐 **{final_word}** 검색 결과입니다.")
+        
+        with st.container():
+            selected_subject_to_save = st.selectbox("📚 저장할 과목을 선택하세요", SUBJECTS)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                final_meaning = st.text_area("🇰🇷 뜻 (품사 포함)", value=default_meaning, height=150)
+            with col2:
+                final_example = st.text_area("🇺🇸 예문", value=default_example, height=150)
+
+            if st.button("💾 단어장에 추가하기", type="primary", use_container_width=True, disabled=voca_store is None):
+                if not final_meaning or not final_example:
+                    st.warning("내용이 비어있습니다.")
+                elif voca_dupes.has_exact(final_word):
+                    st.error("이미 저장된 단어입니다.")
+                else:
+                    try:
+                        row_id = new_row_id()
+                        new_entry = {
+                            "단어": final_word,
+                            "뜻": final_meaning,
+                            "예문": final_example,
+                            "과목": selected_subject_to_save
+                        }
+                        with span("storage.write"):
+                            voca_store.append(row_id, new_entry)
+                        voca_cache.append(row_id, new_entry)
+                        
+                        st.toast(f"'{final_word}' 저장 성공! 🎉")
+                        if 'analyzed_word' in st.session_state: del st.session_state['analyzed_word']
+                        if 'analyzed_result' in st.session_state: del st.session_state['analyzed_result']
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"저장 실패: {e}")
+
+    # 여러 단어 한 번에 추가
+    with st.expander("📦 여러 단어 한 번에 추가 (대량 분석)"):
+        bulk_text = st.text_area(
+            "단어 목록 (줄바꿈 또는 쉼표로 구분)",
+            placeholder="address\nlook up to\nsubtle",
+            height=150
+        )
+        bulk_file = st.file_uploader("또는 .txt / .csv 파일 업로드", type=["txt", "csv"])
+
+        bc1, bc2 = st.columns(2)
+        with bc1:
+            bulk_subject = st.selectbox("📚 저장할 과목", SUBJECTS, key="bulk_subject")
+        with bc2:
+            bulk_rpm = st.number_input("⏱️ 분당 요청 수", min_value=1, max_value=1000, value=GEMINI_RPM, step=1)
+
+        def run_bulk_analysis(items):
+            """단어 목록 → 중복/이미 있는 단어를 빼고 동시 분석 → 결과는 bulk_results 에"""
+            # 중복 제거 (입력 순서 유지) + 이미 단어장에 있는 단어는 건너뜀
+            bulk_words = []
+            seen = set()
+            for item in items:
+                item = item.strip()
+                if item and item not in seen:
+                    seen.add(item)
+                    bulk_words.append(item)
+            skipped = [w for w in bulk_words if voca_dupes.has_exact(w)]
+            bulk_words = [w for w in bulk_words if not voca_dupes.has_exact(w)]
+
+            if skipped:
+                st.caption(f"이미 있는 단어 {len(skipped)}개는 건너뜁니다: {', '.join(skipped)}")
+
+            if not GEMINI_API_KEY:
+                st.error("AI 모델 연결 실패")
+            elif not bulk_words:
+                st.info("분석할 새 단어가 없습니다.")
+            else:
+                progress = st.progress(0.0, text=f"분석 중... 0/{len(bulk_words)}")
+                bulk_rows = []
+                bulk_errors = []
+
+                def on_bulk_done(word, raw_text, error):
+                    if error is not None:
+                        bulk_errors.append(f"{word}: {describe_gemini_error(error)}")
+                    else:
+                        final, meaning, example = parse_analysis(raw_text, word)
+                        bulk_rows.append({
+                            # 비슷한 단어(Address / addresses)가 있으면 기본으로 체크 해제
+                            "추가": not voca_dupes.find(final) and bool(meaning),
+                            "단어": final,
+                            "뜻": meaning,
+                            "예문": example,
+                        })
+                    done = len(bulk_rows) + len(bulk_errors)
+                    progress.progress(done / len(bulk_words), text=f"분석 중... {done}/{len(bulk_words)} ({word})")
+
+                with span("gemini.bulk_analyze"):
+                    analyze_words_concurrently(bulk_words, int(bulk_rpm), on_bulk_done)
+                progress.progress(1.0, text=f"분석 완료: {len(bulk_rows)}개 성공, {len(bulk_errors)}개 실패")
+                st.session_state["bulk_results"] = bulk_rows
+                st.session_state["bulk_errors"] = bulk_errors
+
+        if st.button("🔍 전체 분석", use_container_width=True):
+            raw_items = bulk_text
+            if bulk_file is not None:
+                raw_items += "\n" + bulk_file.getvalue().decode("utf-8-sig", errors="ignore")
+            run_bulk_analysis(re.split(r"[\n,\t]+", raw_items))
+
+        # 긴 강의록 / 자막 파일에서 자주 나온 모르는 단어 뽑기 → 고른 단어만 위와 같은 대량 분석으로
+        st.markdown("##### 🎬 자막/강의록에서 단어 뽑기")
+        source_file = st.file_uploader(
+            "강의록 .txt 또는 자막 .srt / .vtt 파일", type=["txt", "srt", "vtt"], key="bulk_source"
+        )
+        ec1, ec2 = st.columns(2)
+        with ec1:
+            min_count = st.number_input("최소 등장 횟수", min_value=1, max_value=1000, value=2, step=1)
+        with ec2:
+            max_candidates = st.number_input("후보 수", min_value=10, max_value=1000, value=100, step=10)
+
+        if source_file is not None and st.button("📊 단어 뽑기", use_container_width=True):
+            extractor = WordExtractor(subtitle=source_file.name.lower().endswith((".srt", ".vtt")))
+            size = max(source_file.size, 1)
+            progress = st.progress(0.0, text="읽는 중...")
+            source_file.seek(0)
+            with span("tab1.extract"):
+                for text, read in iter_text_chunks(source_file):
+                    extractor.feed(text)
+                    progress.progress(min(read / size, 1.0), text=f"읽는 중... {read / 1e6:.1f} / {size / 1e6:.1f} MB")
+                candidates = extractor.candidates(voca_dupes.has_exact, int(min_count), int(max_candidates))
+            progress.progress(1.0, text=f"단어 {extractor.tokens:,}개 중 후보 {len(candidates)}개")
+            st.session_state["bulk_candidates"] = [{"선택": True, **c} for c in candidates]
+
+        if st.session_state.get("bulk_candidates"):
+            picked = st.data_editor(
+                pd.DataFrame(st.session_state["bulk_candidates"]),
+                key="bulk_candidate_editor",
+                hide_index=True,
+                use_container_width=True,
+                disabled=["횟수"],
+            )
+            if st.button("🔍 선택한 단어 분석", use_container_width=True):
+                run_bulk_analysis(picked.loc[picked["선택"], "단어"].astype(str))
+                if st.session_state.get("bulk_results"):
+                    st.session_state.pop("bulk_candidates", None)
+
+        if st.session_state.get("bulk_errors"):
+            with st.expander(f"⚠️ 분석 실패 ({len(st.session_state['bulk_errors'])}개)"):
+                for err in st.session_state["bulk_errors"]:
+                    st.caption(err)
+
+        if st.session_state.get("bulk_results"):
+            edited = st.data_editor(
+                pd.DataFrame(st.session_state["bulk_results"]),
+                key="bulk_editor",
+                hide_index=True,
+                use_container_width=True,
+            )
+            if st.button("💾 선택한 단어 모두 추가", type="primary", use_container_width=True, disabled=voca_store is None):
+                new_rows = []
+                batch_words = set()
+                for _, r in edited[edited["추가"]].iterrows():
+                    word = str(r["단어"]).strip()
+                    if not word or voca_dupes.has_exact(word) or normalize_word(word) in batch_words:
+                        continue
+                    batch_words.add(normalize_word(word))
+                    new_rows.append((new_row_id(), {
+                        "단어": word,
+                        "뜻": r["뜻"],
+                        "예문": r["예문"],
+                        "과목": bulk_subject
+                    }))
+
+                if not new_rows:
+                    st.warning("추가할 단어가 없습니다.")
+                else:
+                    try:
+                        # 한 번의 시트 요청으로 전부 추가
+                        with span("storage.write"):
+                            voca_store.append_rows(new_rows)
+                        voca_cache.append_rows(new_rows)
+                        st.toast(f"{len(new_rows)}개 단어 저장 성공! 🎉")
+                        del st.session_state["bulk_results"]
+                        st.session_state.pop("bulk_errors", None)
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"저장 실패: {e}")
+
+    # 중복 단어 정리
+    with st.expander("🧹 중복 단어 정리"):
+        st.caption("대소문자·띄어쓰기·활용형(addresses, addressed …)이 다른 같은 단어를 찾아 뜻/예문을 합칩니다.")
+        dup_typo = st.checkbox("철자 한 글자 차이도 찾기", key="dup_typo")
+        if st.button("🔍 중복 찾기", use_container_width=True):
+            clusters = voca_dupes.clusters(typo=dup_typo)
+            st.session_state["dup_clusters"] = clusters
+            if not clusters:
+                st.info("중복 후보가 없습니다. 🎉")
+
+        if st.session_state.get("dup_clusters"):
+            dup_rows = []
+            dup_words = set()
+            for kind, row_ids in st.session_state["dup_clusters"]:
+                ordered = merge_order(existing_data, row_ids, longest=kind == "typo")
+                if ordered is None:
+                    continue
+                words = [str(existing_data.at[row_id, "단어"]) for row_id in ordered]
+                dup_words.update(words)
+                dup_rows.append({
+                    # 활용형/철자 차이로 묶인 것은 (news ≠ new 등) 직접 확인하도록 기본 해제
+                    "병합": kind == "exact",
+                    "남길 단어": words[0],
+                    "묶인 단어": ", ".join(words),
+                    "ids": ",".join(ordered),
+                })
+            if dup_rows:
+                st.caption(f"중복 후보 {len(dup_rows)}묶음 · '남길 단어'를 바꾸면 그 단어에 나머지를 합칩니다.")
+                dup_edited = st.data_editor(
+                    pd.DataFrame(dup_rows),
+                    key="dup_editor",
+                    hide_index=True,
+                    use_container_width=True,
+                    disabled=["묶인 단어"],
+                    column_config={
+                        "ids": None,
+                        "남길 단어": st.column_config.SelectboxColumn(options=sorted(dup_words), required=True),
+                    },
+                )
+                if st.button("🔗 선택한 묶음 병합", type="primary", use_container_width=True, disabled=voca_store is None):
+                    updates = {}
+                    deletes = []
+                    skipped = []
+                    for ids, keep_word in dup_edited.loc[dup_edited["병합"], ["ids", "남길 단어"]].itertuples(index=False):
+                        row_ids = [row_id for row_id in ids.split(",") if row_id in existing_data.index]
+                        keep = next((row_id for row_id in row_ids if existing_data.at[row_id, "단어"] == keep_word), None)
+                        if keep is None:
+                            # 선택 목록은 모든 묶음의 단어라서 다른 묶음의 단어를 고를 수 있음
+                            skipped.append(keep_word)
+                            continue
+                        plan = plan_merge(existing_data, row_ids, keep)
+                        if plan is None:
+                            continue
+                        keep, fields, drop = plan
+                        updates[keep] = fields
+                        deletes.extend(drop)
+                    if skipped:
+                        st.warning(f"묶음에 없는 단어를 골라서 건너뜀: {', '.join(skipped)}")
+                    if not updates:
+                        if not skipped:
+                            st.warning("병합할 묶음을 선택하세요.")
+                    else:
+                        try:
+                            # 수정/삭제를 한 번의 배치 쓰기로
+                            with span("storage.write"):
+                                voca_store.write_many(updates, deletes)
+                            voca_cache.write_many(updates, deletes)
+                            st.session_state.pop("dup_clusters", None)
+                            st.toast(f"{len(updates)}묶음 병합 완료 (단어 {len(deletes)}개 정리) 🎉")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"병합 실패: {e}")
+
+    # 목록 및 백업/링크
+    st.divider()
+    
+    col_header, col_buttons = st.columns([2, 1])
+    
+    with col_header:
+        st.subheader(f"📝 저장된 단어장 ({len(existing_data)}개)")
+        if voca_store is not None:
+            pending_writes = voca_store.pending_writes()
+            if pending_writes:
+                last_flush = voca_store.last_flush
+                since = f" (마지막 반영 {time.strftime('%H:%M:%S', time.localtime(last_flush))})" if last_flush else ""
+                st.caption(f"⏳ 시트 반영 대기 중: {pending_writes}건{since}")
+            if voca_store.last_error is not None:
+                st.caption(f"⚠️ 시트 반영 실패, 자동으로 다시 시도합니다: {voca_store.last_error}")
+            if voca_store.dropped_writes:
+                st.caption(f"⚠️ 시트에서 지워진 단어의 수정 {voca_store.dropped_writes}건은 반영하지 못했습니다.")
+        
+        def reset_word_page():
+            # 검색/필터를 바꾸면 결과의 첫 페이지부터 (정확히 맞는 단어가 맨 앞)
+            st.session_state["word_page"] = 1
+
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            filter_keyword = st.text_input("📂 단어/뜻/예문 검색", placeholder="검색어 입력...", on_change=reset_word_page)
+            fuzzy_search = st.checkbox("오타 허용", value=False, on_change=reset_word_page)
+        with filter_col2:
+            available_subjects = ["전체 보기"] + study_stats.subjects()
+            filter_subject = st.selectbox("📚 과목별 보기", available_subjects, on_change=reset_word_page)
+            export_subject = None if filter_subject == "전체 보기" else filter_subject
+            available_pos = ["전체"] + sorted(p for p in voca_senses["품사"].unique() if p)
+            filter_pos = st.selectbox("🏷️ 품사별 보기", available_pos, on_change=reset_word_page)
+
+    with col_buttons:
+        st.write("")
+        st.write("")
+        b_col1, b_col2, b_col3 = st.columns(3)
+        with b_col1:
+            if not existing_data.empty:
+                # 파일은 버튼을 눌렀을 때만 만들어짐 (버전별 캐시)
+                with st.popover("💾 백업", use_container_width=True):
+                    if export_subject:
+                        st.caption(f"과목: {export_subject}")
+                    export_button("엑셀 (CSV)", existing_data, data_version, "csv", export_subject, "my_voca_backup")
+                    export_button("Parquet", existing_data, data_version, "parquet", export_subject, "my_voca_backup")
+        with b_col2:
+            try:
+                sheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+            except:
+                sheet_url = "https://docs.google.com/spreadsheets"
+            st.link_button("📂 시트 열기", sheet_url, use_container_width=True)
+        with b_col3:
+            if sync_worker is not None:
+                # 로컬 저장소 사용 중: 지금 바로 시트와 동기화
+                if st.button("🔄 동기화", use_container_width=True):
+                    try:
+                        pushed, pulled = sync_worker.sync_now()
+                        st.toast(f"동기화 완료 (보냄 {pushed} · 받음 {pulled})")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"동기화 실패: {e}")
+            elif voca_cache is None:
+                # 연결 실패: 캐시된 시트 연결을 버리고 처음부터 다시 연결
+                if st.button("🔄 다시 연결", use_container_width=True):
+                    get_spreadsheet.clear()
+                    st.rerun()
+            # 시트를 직접 고쳤을 때 캐시를 바로 다시 읽기
+            elif st.button("🔄 새로고침", use_container_width=True):
+                voca_cache.invalidate()
+                st.rerun()
+
+    def open_editor(i):
+        st.session_state[f"editing_{i}"] = True
+
+    def close_editor(i):
+        st.session_state.pop(f"editing_{i}", None)
+
+    # 단어 카드 하나를 fragment로 → 편집 열기/닫기는 이 카드만 다시 실행됨
+    @st.fragment
+    @profiled("tab1.word_card")
+    def word_entry(i):
+        data = voca_cache.data
+        if i not in data.index:
+            return
+        row = data.loc[i]
+        subj_tag = f" [{row['과목']}]" if '과목' in row and pd.notna(row['과목']) else ""
+
+        with st.expander(f"📖 {row['단어']}{subj_tag}"):
+
+            col_copy, col_dict = st.columns([1, 1])
+
+            with col_copy:
+                st.caption("복사하기")
+                st.code(row['단어'], language="text")
+
+            with col_dict:
+                st.caption("발음 듣기 (네이버 사전)")
+                dict_url = f"https://en.dict.naver.com/#/search?query={row['단어']}"
+                st.link_button(f"🔊 {row['단어']} 발음 듣기", dict_url, use_container_width=True)
+
+            # 편집 위젯은 '편집'을 누른 단어에만 만든다
+            if not st.session_state.get(f"editing_{i}", False):
+                c1, c2 = st.columns(2)
+                with c1:
+                    st.caption("뜻")
+                    st.text(row['뜻'] if pd.notna(row['뜻']) else "")
+                with c2:
+                    st.caption("예문")
+                    st.text(row['예문'] if pd.notna(row['예문']) else "")
+                seen, correct = study_stats.word(i)
+                if seen:
+                    st.caption(f"🎯 퀴즈 정답률 {correct / seen:.0%} ({correct}/{seen})")
+                st.button("✏️ 편집", key=f"edit_{i}", on_click=open_editor, args=(i,))
+                return
+
+            c1, c2 = st.columns(2)
+            with c1:
+                new_meaning = st.text_area("뜻", row['뜻'], key=f"m_{i}", height=100)
+            with c2:
+                new_example = st.text_area("예문", row['예문'], key=f"e_{i}", height=100)
+
+            current_subj_val = row['과목'] if '과목' in row and pd.notna(row['과목']) else "공통/기타"
+            new_subj = st.selectbox("과목 변경", SUBJECTS, index=SUBJECTS.index(current_subj_val) if current_subj_val in SUBJECTS else 0, key=f"s_{i}")
+
+            col_save, col_del, col_close = st.columns([1, 1, 1])
+            with col_save:
+                if st.button("💾 수정", key=f"save_{i}"):
+                    fields = {"뜻": new_meaning, "예문": new_example, "과목": new_subj}
+                    with span("storage.write"):
+                        voca_store.update(i, fields)
+                    voca_cache.update(i, fields)
+                    st.session_state.pop(f"editing_{i}", None)
+                    st.toast("수정 완료!")
+                    # 목록/과목 필터에도 반영되도록 전체 다시 실행
+                    st.rerun()
+            with col_del:
+                if st.button("🗑️ 삭제", key=f"del_{i}"):
+                    with span("storage.write"):
+                        voca_store.delete(i)
+                    voca_cache.delete(i)
+                    st.session_state.pop(f"editing_{i}", None)
+                    st.toast("삭제 완료!")
+                    st.rerun()
+            with col_close:
+                st.button("닫기", key=f"close_{i}", on_click=close_editor, args=(i,))
+
+    if not existing_data.empty:
+        display_data = existing_data
+        
+        if filter_keyword:
+            # 검색 인덱스 결과는 관련도 순
+            with span("tab1.search"):
+                matched_ids = voca_cache.search.search(filter_keyword, fuzzy=fuzzy_search)
+            display_data = display_data.loc[[i for i in matched_ids if i in display_data.index]]
+            
+        if filter_subject != "전체 보기":
+            if '과목' in display_data.columns:
+                display_data = display_data[display_data['과목'] == filter_subject]
+
+        if filter_pos != "전체":
+            # 뜻 단위 표에서 그 품사 뜻이 하나라도 있는 단어
+            pos_ids = voca_senses.loc[voca_senses["품사"] == filter_pos, ID_COLUMN].unique()
+            display_data = display_data[display_data.index.isin(pos_ids)]
+
+        if display_data.empty:
+            st.info("조건에 맞는 단어가 없습니다.")
+        else:
+            # 페이지 단위로만 그리기 (최신 단어가 앞쪽)
+            total_count = len(display_data)
+            p_col1, p_col2, p_col3 = st.columns([1, 1, 2])
+            with p_col1:
+                page_size = st.selectbox("페이지당 단어 수", WORD_PAGE_SIZES, index=WORD_PAGE_SIZES.index(DEFAULT_WORD_PAGE_SIZE), key="word_page_size")
+            total_pages = max(1, math.ceil(total_count / page_size))
+            if st.session_state.get("word_page", 1) > total_pages:
+                st.session_state["word_page"] = total_pages
+            with p_col2:
+                page = st.number_input(f"페이지 (전체 {total_pages})", min_value=1, max_value=total_pages, step=1, key="word_page")
+            page_start = (int(page) - 1) * page_size
+            ordered_ids = display_data.index if filter_keyword else display_data.index[::-1]
+            page_ids = ordered_ids[page_start:page_start + page_size]
+            with p_col3:
+                st.write("")
+                st.caption(f"{total_count}개 중 {page_start + 1}–{page_start + len(page_ids)}번째")
+
+            with span("tab1.word_list"):
+                for i in page_ids:
+                    word_entry(i)
+    else:
+        st.info("단어를 검색해서 추가해보세요!")
+
+# ==========================================
+# 탭 2: 영어 공부 도구함
+# ==========================================
+with tab2:
+    st.header("🧰 유용한 영어 도구 모음")
+    st.write("단어장과 함께 쓰면 좋은 사이트들을 모았습니다. 버튼만 누르세요!")
+    
+    st.divider()
+
+    col_t1, col_t2 = st.columns(2)
+
+    with col_t1:
+        st.subheader("🤖 번역 & 문법")
+        st.link_button("🚀 Google Gemini (AI 비서)", "https://gemini.google.com", type="primary", use_container_width=True)
+        st.link_button("🧠 DeepL (자연스러운 번역)", "https://www.deepl.com/translator", use_container_width=True)
+        st.link_button("🦜 Papago (네이버 번역)", "https://papago.naver.com", use_container_width=True)
+        st.link_button("✍️ Grammarly (문법 검사기)", "https://app.grammarly.com/", use_container_width=True)
+
+    with col_t2:
+        st.subheader("📺 학습 & 암기")
+        st.link_button("📺 YouGlish (실제 발음 검색)", "https://youglish.com", use_container_width=True)
+        st.link_button("🔁 Anki (플래시카드 암기)", "https://apps.ankiweb.net/", use_container_width=True)
+        if not existing_data.empty:
+            export_button("🃏 내 단어장 Anki 덱으로 받기", existing_data, data_version, "anki", export_subject, "my_voca_anki")
+            st.caption(
+                f"{export_subject or '전체'} 단어 · 과목은 탭 1의 '과목별 보기'를 따릅니다. "
+                "Anki에서 [파일 → 가져오기]로 불러오세요."
+            )
+    
+    st.info("💡 Tip: YouGlish에서 검색하시면 실제 유튜브 영상들 속에서 원어민들이 해당 단어를 발음하는 문장들을 모아볼 수 있습니다.")
+
+# ==========================================
+# 탭 4: 학습 통계
+# (탭 3은 단어가 없으면 st.stop() 하므로 탭 4를 먼저 그림)
+# ==========================================
+with tab4:
+
+    # 누적값만 읽어서 그림 → 퀴즈 기록이 아무리 쌓여도 그리는 시간은 같음
+    # 퀴즈는 fragment 안에서만 다시 그려지므로 여기도 fragment + 새로고침 버튼
+    @st.fragment
+    @profiled("tab4.dashboard")
+    def stats_panel():
+        head_col, refresh_col = st.columns([5, 1])
+        head_col.header("📊 학습 통계")
+        with refresh_col:
+            st.write("")
+            st.button("🔄 새로고침", use_container_width=True, key="stats_refresh")
+
+        total_seen, total_correct, words_seen = study_stats.overall()
+        trend = study_stats.daily(STATS_TREND_DAYS)
+        today_seen, today_correct = trend[-1][1], trend[-1][2]
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("📝 푼 문제", f"{total_seen}개")
+        m2.metric("📊 전체 정답률", f"{total_correct / total_seen:.0%}" if total_seen else "-")
+        m3.metric("📅 오늘", f"{today_seen}개", f"정답률 {today_correct / today_seen:.0%}" if today_seen else None)
+        m4.metric("🔤 푼 단어", f"{words_seen} / {len(existing_data)}")
+
+        if not total_seen:
+            # 기록이 없으면 그래프(차트 라이브러리 로딩)는 건너뜀
+            st.info("아직 퀴즈 기록이 없습니다. 탭3에서 퀴즈를 풀어보세요!")
+        else:
+            # 최근 추이
+            st.subheader(f"📈 최근 {STATS_TREND_DAYS}일")
+            trend_df = pd.DataFrame(trend, columns=["날짜", "푼 문제", "맞힌 문제"]).set_index("날짜")
+            trend_df["정답률(%)"] = (trend_df["맞힌 문제"] / trend_df["푼 문제"].where(trend_df["푼 문제"] > 0) * 100).round(1)
+            t1, t2 = st.columns(2)
+            with t1:
+                st.caption("날짜별 복습 수")
+                st.bar_chart(trend_df["푼 문제"], height=220)
+            with t2:
+                st.caption("날짜별 정답률 (%)")
+                st.line_chart(trend_df["정답률(%)"], height=220)
+
+        # 과목별 숙련도
+        st.subheader("📚 과목별 숙련도")
+        subject_rows = [
+            {
+                "과목": subject,
+                "단어 수": words,
+                "푼 문제": seen,
+                "정답률": correct / seen if seen else None,
+            }
+            for subject, (words, seen, correct) in study_stats.by_subject().items()
+        ]
+        if subject_rows:
+            st.dataframe(
+                pd.DataFrame(subject_rows),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "정답률": st.column_config.ProgressColumn("정답률", format="percent", min_value=0, max_value=1),
+                },
+            )
+
+        # 자주 틀리는 단어
+        data = voca_cache.data if voca_cache is not None else existing_data
+        weak = study_stats.weakest(STATS_WEAK_WORDS, lambda row_id: row_id in data.index)
+        if weak:
+            with st.expander(f"🔥 자주 틀리는 단어 ({len(weak)}개, {STATS_WEAK_MIN_SEEN}번 이상 푼 단어 중)"):
+                st.dataframe(
+                    pd.DataFrame([
+                        {
+                            "단어": data.at[row_id, "단어"],
+                            "뜻": meaning_summary(data.at[row_id, "뜻"]),
+                            "푼 횟수": seen,
+                            "정답률": correct / seen,
+                        }
+                        for row_id, seen, correct in weak
+                    ]),
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        "정답률": st.column_config.ProgressColumn("정답률", format="percent", min_value=0, max_value=1),
+                    },
+                )
+
+    stats_panel()
+
+# ==========================================
+# 탭 3: 퀴즈 모드
+# ==========================================
+with tab3:
+
+    # ---------- 헬퍼: 퀴즈 초기화 ----------
+    def start_quiz(row_ids, mode, count, style="플래시카드"):
+        """
+        row_ids : 문제로 낼 단어들의 행 ID
+        mode    : "단어 → 뜻" or "뜻 → 단어"
+        count   : 문제 수 (int)
+        style   : "플래시카드" or "객관식"
+        """
+        row_ids = list(row_ids)
+        st.session_state["qz_words"]   = random.sample(row_ids, min(count, len(row_ids)))  # 행 ID 목록
+        st.session_state["qz_results"] = {}  # 문제 번호 → "correct" / "wrong"
+        st.session_state["qz_mode"]    = mode
+        st.session_state["qz_style"]   = style
+        st.session_state["qz_options"] = {}  # 문제 번호 → [(행 ID, 보기 글자), ...] (객관식)
+        st.session_state["qz_choice"]  = None
+        st.session_state["qz_index"]   = 0
+        st.session_state["qz_correct"] = 0
+        st.session_state["qz_wrong"]   = 0
+        st.session_state["qz_revealed"]= False
+        st.session_state["qz_active"]  = True
+        st.session_state["qz_done"]    = False
+
+    def quiz_row(row_id):
+        """행 ID → 단어장 행 (그 사이 삭제됐으면 None), 인덱스 조회라 단어 수와 무관"""
+        data = voca_cache.data
+        return data.loc[row_id] if row_id in data.index else None
+
+    def reset_quiz():
+        for k in ["qz_words","qz_results","qz_mode","qz_style","qz_options","qz_choice",
+                  "qz_index","qz_correct","qz_wrong","qz_revealed","qz_active","qz_done",
+                  "qz_saved","qz_last_subject"]:
+            if k in st.session_state:
+                del st.session_state[k]
+
+    # ---------- 헬퍼: 버튼 콜백 ----------
+    # 콜백은 fragment가 다시 실행되기 전에 처리되므로 st.rerun() 없이 바로 다음 화면이 그려짐
+    def on_start_quiz():
+        subject = st.session_state["qz_subject_sel"]
+        subject_key = None if subject == "전체" else subject
+        due_before = end_of_today() if st.session_state["qz_due_only"] else None
+        count = int(st.session_state["qz_count"])
+
+        # 복습 시기가 가장 급한 단어부터 (안 푼 단어 → 오래 밀린 단어 순)
+        due_ids = scheduler.most_due(count, subject_key, due_before)
+        if not due_ids:
+            if due_before is not None:
+                st.session_state["qz_notice"] = "오늘 복습할 단어가 없습니다. 🎉"
+            else:
+                st.session_state["qz_notice"] = "선택한 과목에 단어가 없습니다."
+            return
+        start_quiz(due_ids, st.session_state["qz_mode_sel"], count, st.session_state["qz_style_sel"])
+        st.session_state["qz_last_subject"] = subject
+        st.session_state["qz_saved"] = False
+
+    def on_retry_quiz():
+        words = st.session_state["qz_words"]
+        start_quiz(words, st.session_state["qz_mode"], len(words), st.session_state["qz_style"])
+
+    def on_reveal():
+        st.session_state["qz_revealed"] = True
+
+    def on_choose(row_id):
+        st.session_state["qz_choice"] = row_id
+        st.session_state["qz_revealed"] = True
+
+    def option_label(row_id):
+        """객관식 보기 글자: 단어 → 뜻 이면 뜻 첫 줄, 뜻 → 단어 면 단어"""
+        row = quiz_row(row_id)
+        if row is None:
+            return ""
+        if st.session_state["qz_mode"] == "단어 → 뜻":
+            return meaning_summary(row["뜻"])
+        return str(row["단어"]).strip()
+
+    def quiz_options(idx):
+        """idx 번 문제의 보기 (처음 볼 때 한 번만 뽑고 저장 → 다시 그려도 순서 유지)"""
+        options = st.session_state["qz_options"]
+        if idx not in options:
+            answer = st.session_state["qz_words"][idx]
+            row_ids = [answer] + distractors.sample(answer, MC_OPTIONS - 1, option_label)
+            random.shuffle(row_ids)
+            options[idx] = [(row_id, option_label(row_id)) for row_id in row_ids]
+        return options[idx]
+
+    def on_answer(correct):
+        idx = st.session_state["qz_index"]
+        st.session_state["qz_results"][idx] = "correct" if correct else "wrong"
+        scheduler.record(st.session_state["qz_words"][idx], correct)
+        study_stats.record(st.session_state["qz_words"][idx], correct)
+        if correct:
+            st.session_state["qz_correct"] += 1
+        else:
+            st.session_state["qz_wrong"] += 1
+        st.session_state["qz_index"] += 1
+        st.session_state["qz_revealed"] = False
+        st.session_state["qz_choice"] = None
+        # 마지막 문제였으면 완료
+        if st.session_state["qz_index"] >= len(st.session_state["qz_words"]):
+            st.session_state["qz_done"] = True
+
+    # ---------- 단어 없을 때 ----------
+    if existing_data.empty:
+        st.info("저장된 단어가 없습니다. 탭1에서 단어를 추가하세요!")
+        st.stop()
+
+    # 복습 스케줄러를 단어장 최신 상태에 맞춤 (바뀐 행만 반영)
+    scheduler = get_review_scheduler(voca_worksheet)
+    with span("tab3.scheduler_sync"):
+        scheduler.sync(voca_cache)
+
+    # 객관식 오답 인덱스 (데이터가 바뀌었을 때만 다시 만듦)
+    distractors = get_distractor_index(voca_worksheet)
+    with span("tab3.distractor_sync"):
+        distractors.sync(voca_senses, senses_version)
+
+    # 퀴즈 화면 전체를 fragment로 → 카드 넘길 때 이 부분만 다시 실행됨
+    @st.fragment
+    @profiled("tab3.quiz_panel")
+    def quiz_panel():
+        # 퀴즈 도중 삭제된 단어는 건너뛰고, 끝까지 풀었으면 완료 처리
+        if st.session_state.get("qz_active", False) and not st.session_state.get("qz_done", False):
+            words = st.session_state["qz_words"]
+            while st.session_state["qz_index"] < len(words) and quiz_row(words[st.session_state["qz_index"]]) is None:
+                st.session_state["qz_index"] += 1
+            if st.session_state["qz_index"] >= len(words):
+                st.session_state["qz_done"] = True
+
+        # ---------- 퀴즈 미시작: 설정 화면 ----------
+        if not st.session_state.get("qz_active", False):
+
+            st.header("🎯 퀴즈 모드")
+            st.write("저장된 단어장으로 플래시카드 퀴즈를 풀어보세요!")
+            st.divider()
+
+            c1, c2, c3 = st.columns(3)
+
+            with c1:
+                # 과목 필터
+                quiz_subjects = ["전체"] + study_stats.subjects()
+                quiz_subject = st.selectbox("📚 과목 선택", quiz_subjects, key="qz_subject_sel")
+                quiz_due_only = st.checkbox("📅 오늘 복습할 단어만", key="qz_due_only")
+                subject_key = None if quiz_subject == "전체" else quiz_subject
+                due_before = end_of_today() if quiz_due_only else None
+
+            with c2:
+                # 문제 수
+                if quiz_due_only:
+                    max_count = scheduler.due_count(subject_key, due_before)
+                elif quiz_subject == "전체":
+                    max_count = len(existing_data)
+                else:
+                    max_count = study_stats.subject_count(quiz_subject)
+
+                st.number_input(
+                    f"📝 문제 수 (최대 {max_count}개)",
+                    min_value=1,
+                    max_value=max(1, max_count),
+                    value=max(1, min(25, max_count)),
+                    step=1,
+                    key="qz_count"
+                )
+
+            with c3:
+                # 퀴즈 방향
+                st.selectbox(
+                    "🔄 퀴즈 방향",
+                    ["단어 → 뜻", "뜻 → 단어"],
+                    key="qz_mode_sel"
+                )
+                # 객관식: 같은 과목·품사의 다른 단어로 오답 보기
+                st.radio("📝 퀴즈 유형", ["플래시카드", "객관식"], horizontal=True, key="qz_style_sel")
+
+            st.write("")
+
+            st.button("🚀 퀴즈 시작!", type="primary", use_container_width=True, on_click=on_start_quiz)
+            if "qz_notice" in st.session_state:
+                st.warning(st.session_state.pop("qz_notice"))
+
+        # ---------- 결과 화면 ----------
+        elif st.session_state.get("qz_done", False):
+
+            words   = st.session_state["qz_words"]
+            correct = st.session_state["qz_correct"]
+            wrong   = st.session_state["qz_wrong"]
+            total   = len(words)
+            pct     = int(correct / total * 100) if total > 0 else 0
+
+            st.header("🏁 퀴즈 완료!")
+            st.divider()
+
+            m1, m2, m3 = st.columns(3)
+            m1.metric("✅ 맞음", f"{correct}개")
+            m2.metric("❌ 틀림", f"{wrong}개")
+            m3.metric("📊 정답률", f"{pct}%")
+
+            st.write("")
+
+            if pct == 100:
+                st.success("🎉 완벽해요! 모두 다 알고 있네요!")
+            elif pct >= 70:
+                st.info("👍 잘했어요! 조금만 더 복습하면 완벽!")
+            else:
+                st.warning("💪 더 복습이 필요해요. 한 번 더 도전해보세요!")
+
+            st.divider()
+
+            # 틀린 단어 모아보기
+            results = st.session_state["qz_results"]
+            wrong_indices = [
+                i for i in range(total)
+                if results.get(i) == "wrong" and quiz_row(words[i]) is not None
+            ]
+            if wrong_indices:
+                with st.expander(f"❌ 틀린 단어 모아보기 ({len(wrong_indices)}개)"):
+                    for idx in wrong_indices:
+                        row = quiz_row(words[idx])
+                        st.markdown(f"**{row['단어']}**")
+                        st.caption(row["뜻"])
+                        st.divider()
+
+            st.divider()
+
+            col_r1, col_r2 = st.columns(2)
+            with col_r1:
+                st.button("🔄 같은 설정으로 다시", use_container_width=True, on_click=on_retry_quiz)
+            with col_r2:
+                st.button("🏠 설정 화면으로", use_container_width=True, type="primary", on_click=reset_quiz)
+
+        # ---------- 퀴즈 진행 중 ----------
+        else:
+            words   = st.session_state["qz_words"]
+            idx     = st.session_state["qz_index"]
+            mode    = st.session_state["qz_mode"]
+            total   = len(words)
+
+            current = quiz_row(words[idx])
+
+            # 진행 표시
+            st.progress((idx) / total, text=f"진행: {idx}/{total}문제")
+
+            col_correct, col_wrong, col_quit = st.columns([2, 2, 1])
+            col_correct.metric("✅ 맞음", st.session_state["qz_correct"])
+            col_wrong.metric("❌ 틀림", st.session_state["qz_wrong"])
+            with col_quit:
+                st.write("")
+                st.button("🚪 종료", use_container_width=True, on_click=reset_quiz)
+
+            st.divider()
+
+            # 문제 카드
+            st.markdown(f"### 문제 {idx + 1} / {total}")
+
+            if mode == "단어 → 뜻":
+                question_label = "🔤 단어"
+                question_value = current["단어"]
+                answer_label   = "🇰🇷 뜻"
+                answer_value   = current["뜻"]
+            else:
+                question_label = "🇰🇷 뜻"
+                question_value = current["뜻"]
+                answer_label   = "🔤 단어"
+                answer_value   = current["단어"]
+
+            # 문제 표시
+            st.markdown(
+                f"""
+                <div style="
+                    background: #1e3a5f;
+                    border-radius: 16px;
+                    padding: 32px;
+                    text-align: center;
+                    margin: 16px 0;
+                ">
+                    <p style="color:#aac8e4; font-size:14px; margin:0 0 8px 0;">{question_label}</p>
+                    <p style="color:#ffffff; font-size:32px; font-weight:700; margin:0; word-break:break-word;">
+                        {question_value}
+                    </p>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+            # ---------- 객관식 ----------
+            if st.session_state["qz_style"] == "객관식":
+                answer_id = words[idx]
+                choice = st.session_state["qz_choice"]
+
+                for n, (row_id, label) in enumerate(quiz_options(idx)):
+                    if not st.session_state["qz_revealed"]:
+                        st.button(label, key=f"qz_opt_{idx}_{n}", use_container_width=True, on_click=on_choose, args=(row_id,))
+                    elif row_id == answer_id:
+                        st.success(f"✅ {label}")
+                    elif row_id == choice:
+                        st.error(f"❌ {label}")
+                    else:
+                        st.info(label)
+
+                if st.session_state["qz_revealed"]:
+                    if pd.notna(current["예문"]) and current["예문"]:
+                        with st.expander("📖 예문 보기"):
+                            st.write(current["예문"])
+                    st.button(
+                        "다음 문제 ➡️", use_container_width=True, type="primary",
+                        on_click=on_answer, args=(choice == answer_id,)
+                    )
+
+            # 정답 공개 전
+            elif not st.session_state["qz_revealed"]:
+                st.button("정답 보기", use_container_width=True, type="primary", on_click=on_reveal)
+
+            # 정답 공개 후
+            else:
+                # 정답 카드
+                st.markdown(
+                    f"""
+                    <div style="
+                        background: #1a4a2e;
+                        border-radius: 16px;
+                        padding: 24px;
+                        text-align: center;
+                        margin: 8px 0 16px 0;
+                    ">
+                        <p style="color:#7fd4a0; font-size:14px; margin:0 0 8px 0;">{answer_label}</p>
+                        <p style="color:#d4f5e2; font-size:22px; font-weight:600; margin:0; word-break:break-word;">
+                            {answer_value}
+                        </p>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+                # 예문도 보여주기
+                if pd.notna(current["예문"]) and current["예문"]:
+                    with st.expander("📖 예문 보기"):
+                        st.write(current["예문"])
+
+                # 맞음/틀림 버튼
+                btn_col1, btn_col2 = st.columns(2)
+
+                with btn_col1:
+                    st.button("✅ 알았어!", use_container_width=True, type="primary", on_click=on_answer, args=(True,))
+
+                with btn_col2:
+                    st.button("❌ 몰랐어...", use_container_width=True, on_click=on_answer, args=(False,))
+
+    quiz_panel()
+
+if PROFILE_ENABLED:
+    finish_profile_run()